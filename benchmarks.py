@@ -0,0 +1,243 @@
+'''Benchmarks for ICUSIM.
+
+Times simulate() across scales for each engine, the MonteCarlo,
+SobolSensitivity and MorrisScreening drivers, and stats_to_dataframe(),
+recording wall time, peak memory and patients processed per second.
+Also checks that the alternative engines agree statistically with the
+SimPy reference engine.
+
+    python benchmarks.py                            # run and print
+    python benchmarks.py --save baseline.json       # store a baseline
+    python benchmarks.py --compare baseline.json    # fail on slowdowns
+
+'''
+
+import argparse
+import io
+import json
+import contextlib
+import time
+import tracemalloc
+
+import numpy as np
+
+import icusim
+
+
+_BASE_ = {'initial_patient_count': 80,
+          'ventilation_rate': 0.3,
+          'days_to_simulate': 30,
+          'doubles_in_days': 8,
+          'standard_capacity': 400,
+          'ventilated_capacity': 230,
+          'standard_cfr': 0.4,
+          'ventilated_cfr': 0.8,
+          'standard_duration': 10,
+          'ventilated_duration': 10}
+
+# every axis is varied on its own, the other inputs stay at _BASE_
+_AXES_ = {'days_to_simulate': [20, 40, 60],
+          'initial_patient_count': [50, 150, 300],
+          'standard_capacity': [200, 1000, 5000],
+          'doubles_in_days': [12, 6, 3]}
+
+_PARAM_DICT_ = {'initial_patient_count': 80,
+                'days_to_simulate': 30,
+                'total_capacity_min': 200,
+                'total_capacity_max': 1000,
+                'ventilated_icu_share_min': .4,
+                'ventilated_icu_share_max': .6,
+                'standard_cfr_min': 0.2,
+                'standard_cfr_max': 0.6,
+                'ventilated_cfr_min': 1.3,
+                'ventilated_cfr_max': 1.7,
+                'standard_duration_min': 8.5,
+                'standard_duration_max': 25.5,
+                'ventilated_duration_factor_min': .9,
+                'ventilated_duration_factor_max': 1.1,
+                'doubles_in_days_min': 2.0,
+                'doubles_in_days_max': 12.0,
+                'ventilation_rate_min': 0.3,
+                'ventilation_rate_max': 0.8}
+
+_ENGINES_ = ['simpy', 'numpy', 'cohort']
+
+
+def measure(function, repeat=1):
+
+    '''Runs function repeat times and returns the best wall time, the
+    peak memory of one more run and the return value.'''
+
+    best = np.inf
+
+    # progress bars of the drivers are not part of the output
+    with contextlib.redirect_stderr(io.StringIO()):
+        for i in range(repeat):
+            start = time.perf_counter()
+            function()
+            best = min(best, time.perf_counter() - start)
+
+        # tracing slows the run down, so memory is measured separately
+        tracemalloc.start()
+        out = function()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    return best, peak, out
+
+
+def patients(daily):
+
+    '''Returns the number of patients a run processed: the starting
+    patients and everyone who arrived.'''
+
+    demand = [i for i, name in enumerate(icusim.columns()) if name.endswith('total_demand')]
+
+    return float(np.sum(np.asarray(daily)[..., demand]))
+
+
+def bench_simulate(repeat):
+
+    out = []
+
+    for engine in _ENGINES_:
+        for axis, values in _AXES_.items():
+            for value in values:
+
+                p = dict(_BASE_, **{axis: value})
+
+                seconds, memory, daily = measure(lambda: icusim.simulate(p,
+                                                                         random_seed=1,
+                                                                         engine=engine,
+                                                                         output='array'), repeat)
+
+                count = patients(daily) + p['initial_patient_count']
+
+                out.append({'name': 'simulate/%s/%s=%s' % (engine, axis, value),
+                            'seconds': seconds,
+                            'peak_mb': memory / 2 ** 20,
+                            'patients_per_second': count / seconds})
+
+    return out
+
+
+def bench_drivers(rounds, repeat):
+
+    out = []
+
+    drivers = {'montecarlo/simpy': lambda: icusim.MonteCarlo(rounds, _PARAM_DICT_, random_seed=1),
+               'montecarlo/numpy': lambda: icusim.MonteCarlo(rounds, _PARAM_DICT_, random_seed=1, engine='numpy'),
+               'sobol': lambda: icusim.SobolSensitivity(rounds, _PARAM_DICT_, random_seed=1),
+               'morris': lambda: icusim.MorrisScreening(rounds, _PARAM_DICT_, random_seed=1)}
+
+    for name, driver in drivers.items():
+
+        seconds, memory, _ = measure(driver, repeat)
+
+        out.append({'name': name,
+                    'seconds': seconds,
+                    'peak_mb': memory / 2 ** 20,
+                    'rounds_per_second': rounds / seconds})
+
+    daily = [icusim.simulate(_BASE_, random_seed=i, engine='numpy', output='array') for i in range(rounds)]
+
+    for name, stats in {'stats_to_dataframe/dict': icusim.simulate(_BASE_, random_seed=1),
+                        'stats_to_dataframe/stacked': daily}.items():
+
+        seconds, memory, _ = measure(lambda: icusim.stats_to_dataframe(stats), repeat)
+
+        out.append({'name': name,
+                    'seconds': seconds,
+                    'peak_mb': memory / 2 ** 20})
+
+    return out
+
+
+def check_engines(seeds, alpha=.001):
+
+    '''Compares the mean of every daily metric of each alternative
+    engine to the SimPy engine over seeds runs with Welch's t-test.
+    Returns one record per engine with the smallest p-value; an engine
+    fails when it is below alpha after Bonferroni correction.'''
+
+    from scipy.stats import ttest_ind
+
+    runs = {engine: np.array([icusim.simulate(_BASE_, random_seed=seed, engine=engine, output='array')
+                              for seed in range(seeds)], dtype=float)
+            for engine in _ENGINES_}
+
+    out = []
+
+    for engine in _ENGINES_[1:]:
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            p_values = ttest_ind(runs['simpy'], runs[engine], axis=0, equal_var=False).pvalue
+
+        # metrics that never change, like refusals under spare capacity, give NaN
+        p_values = p_values[~np.isnan(p_values)]
+        smallest = float(p_values.min()) if len(p_values) else 1.0
+
+        out.append({'name': 'agreement/%s' % engine,
+                    'p_value': smallest,
+                    'passed': smallest * max(len(p_values), 1) >= alpha})
+
+    return out
+
+
+def compare(results, baseline, tolerance):
+
+    '''Returns the benchmarks that got slower than tolerance times
+    their baseline wall time.'''
+
+    baseline = {record['name']: record for record in baseline}
+    slower = []
+
+    for record in results:
+        if record['name'] in baseline and 'seconds' in record:
+            ratio = record['seconds'] / baseline[record['name']]['seconds']
+            record['ratio'] = ratio
+
+            if ratio > tolerance:
+                slower.append(record)
+
+    return slower
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description='ICUSIM benchmarks')
+    parser.add_argument('--save', help='write the results to this JSON file')
+    parser.add_argument('--compare', help='baseline JSON file to compare with')
+    parser.add_argument('--tolerance', type=float, default=1.5,
+                        help='allowed slowdown against the baseline')
+    parser.add_argument('--rounds', type=int, default=100, help='rounds for the drivers')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per benchmark, the best counts')
+    parser.add_argument('--seeds', type=int, default=40, help='runs per engine for the agreement check')
+    args = parser.parse_args()
+
+    results = bench_simulate(args.repeat) + bench_drivers(args.rounds, args.repeat) + check_engines(args.seeds)
+
+    failed = [record['name'] for record in results if record.get('passed') is False]
+
+    if args.compare is not None:
+        with open(args.compare) as f:
+            failed += [record['name'] for record in compare(results, json.load(f), args.tolerance)]
+
+    for record in results:
+        print('  '.join([record['name'].ljust(44)] +
+                        [key + '=' + (str(value) if isinstance(value, bool) else '%.4g' % value)
+                         for key, value in record.items() if key != 'name']))
+
+    if args.save is not None:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=1)
+
+    if failed:
+        print('FAILED: ' + ', '.join(failed))
+        return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
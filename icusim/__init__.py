@@ -1,6 +1,16 @@
-from .icu_burden_simulator import simulate
+__version__ = '0.2.0'
+
+from .icu_burden_simulator import simulate, simulate_iter, exceeds
+from .numpy_simulator import simulate_batch
 from .stats_to_dataframe import stats_to_dataframe
-from .params import params
+from .params import params, params_batch
 from .utils import columns
+from .trajectories import load_trajectories
+from .snapshot import snapshot, branch, Snapshot
+from .summary import Summary
+from .profiling import Profile
+from .cache import ResultCache
 from .commands.MonteCarlo import MonteCarlo
-from .commands.SobolSensitivity import SobolSensitivity
\ No newline at end of file
+from .commands.SobolSensitivity import SobolSensitivity
+from .commands.MorrisScreening import MorrisScreening
+from .commands.GridSweep import GridSweep
@@ -0,0 +1,123 @@
+import os
+
+
+class ResultCache:
+
+    def __init__(self, path, max_bytes=2 ** 30):
+
+        '''On-disk cache for the daily statistics of seeded simulate()
+        runs. Entries are addressed by a hash of the normalized input
+        parameters, the seed, the engine and the package version, and
+        stored as .npy files. The least recently used entries are
+        removed when the cache grows beyond max_bytes.
+
+        path | str | directory for the cache
+        max_bytes | int | size limit of the cache in bytes
+
+        '''
+
+        self.path = path
+        self.max_bytes = max_bytes
+        self._size = None
+
+    def key(self, p, random_seed, engine):
+
+        '''Returns the content address for a run.'''
+
+        import hashlib
+        import json
+
+        from . import __version__
+
+        # numbers are compared by value, so 10, 10.0 and np.int64(10) match
+        normalized = {key: float(value) for key, value in p.items()}
+        content = json.dumps([normalized, int(random_seed), engine, __version__], sort_keys=True)
+
+        return hashlib.sha256(content.encode()).hexdigest()
+
+    def _file(self, key):
+
+        return os.path.join(self.path, key[:2], key + '.npy')
+
+    def get(self, key):
+
+        '''Returns the cached (day, metric) array or None.'''
+
+        import numpy as np
+
+        file_path = self._file(key)
+
+        try:
+            statistic = np.load(file_path)
+            os.utime(file_path)
+
+        except (OSError, ValueError):
+            return None
+
+        return statistic
+
+    def put(self, key, statistic):
+
+        '''Stores a (day, metric) array and evicts old entries if the
+        cache has grown too large.'''
+
+        import numpy as np
+
+        file_path = self._file(key)
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+
+        # write under a temporary name so readers never see partial files
+        temp_path = file_path + '.%d.tmp' % os.getpid()
+
+        with open(temp_path, 'wb') as f:
+            np.save(f, np.asarray(statistic, dtype=np.int32))
+
+        os.replace(temp_path, file_path)
+
+        if self._size is None:
+            self._size = sum(size for _, _, size in self._entries())
+        else:
+            self._size += os.path.getsize(file_path)
+
+        if self._size > self.max_bytes:
+            self._evict()
+
+    def _entries(self):
+
+        if not os.path.isdir(self.path):
+            return
+
+        for folder in os.scandir(self.path):
+            if not folder.is_dir():
+                continue
+
+            for entry in os.scandir(folder.path):
+                if entry.name.endswith('.npy'):
+                    stat = entry.stat()
+                    yield entry.path, stat.st_mtime, stat.st_size
+
+    def _evict(self):
+
+        # drop least recently used entries until 90% of the limit
+        entries = sorted(self._entries(), key=lambda entry: entry[1])
+        self._size = sum(size for _, _, size in entries)
+
+        for file_path, _, size in entries:
+            if self._size <= self.max_bytes * 0.9:
+                break
+
+            try:
+                os.remove(file_path)
+            except OSError:
+                continue
+
+            self._size -= size
+
+    def clear(self):
+
+        '''Removes all entries.'''
+
+        for file_path, _, size in list(self._entries()):
+            os.remove(file_path)
+
+        self._size = 0
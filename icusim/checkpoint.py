@@ -0,0 +1,25 @@
+def save_checkpoint(path, state):
+
+    '''Writes a checkpoint dictionary to path. The file is replaced
+    atomically, so an interrupted write leaves the previous checkpoint
+    intact.'''
+
+    import os
+    import pickle
+
+    temp_path = path + '.tmp'
+
+    with open(temp_path, 'wb') as f:
+        pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    os.replace(temp_path, path)
+
+
+def load_checkpoint(path):
+
+    '''Reads a checkpoint written by save_checkpoint().'''
+
+    import pickle
+
+    with open(path, 'rb') as f:
+        return pickle.load(f)
@@ -0,0 +1,202 @@
+'''Command line interface for running ICUSIM jobs.
+
+    icusim simulate job.json --output daily.npz
+    icusim montecarlo job.json --output peaks.parquet --seed 7
+    icusim sobol job.json --output sensitivity.parquet
+    icusim gridsweep job.json --output grid.csv
+
+A job spec is a JSON file such as:
+
+    {"params": {"initial_patient_count": 80,
+                "days_to_simulate": 50,
+                "total_capacity_min": 200,
+                "total_capacity_max": 1000},
+     "rounds": 1000,
+     "random_seed": 42,
+     "n_jobs": 4,
+     "engine": "numpy",
+     "montecarlo": {"sampling": "lhs"},
+     "sobol": {"second_order": true},
+     "gridsweep": {"axes": {"total_capacity": [200, 600, 1000],
+                            "doubles_in_days": [4, 8]}}}
+
+params holds the ranges of icusim.params(), or for simulate also the
+inputs of icusim.simulate() directly. The entry named after the command
+holds further keyword arguments for it, so one spec can serve all
+commands. For gridsweep, rounds are per cell. Ranges missing from
+params take the defaults of params(). sobol always runs serially on
+the simpy engine and warns when engine or n_jobs ask otherwise. The
+output format follows the extension of the output file: .npz, .parquet
+or .csv. Parquet needs pyarrow or fastparquet, which are installed with
+pip install icusim[parquet].
+
+'''
+
+import argparse
+import json
+
+
+def _check_output(path):
+
+    '''Raises if the results of a job could not be written to path, so
+    that this is known before the job runs.'''
+
+    import importlib.util
+
+    if not path.endswith(('.npz', '.parquet', '.csv')):
+        raise ValueError("The output file must end with .npz, .parquet or .csv")
+
+    if path.endswith('.parquet') and not any(importlib.util.find_spec(name) for name in ('pyarrow', 'fastparquet')):
+        raise ImportError("Writing .parquet needs pyarrow or fastparquet, see pip install icusim[parquet]")
+
+
+def _write(path, columns):
+
+    '''Writes a dict of equally long arrays as columns.'''
+
+    if path.endswith('.npz'):
+        import numpy as np
+
+        # text columns are stored as strings so that loading needs no pickle
+        np.savez(path, **{key: value.astype(str) if value.dtype == object else value
+                          for key, value in columns.items()})
+
+    else:
+        import pandas as pd
+        df = pd.DataFrame(columns)
+
+        if path.endswith('.parquet'):
+            df.to_parquet(path, index=False)
+        else:
+            df.to_csv(path, index=False)
+
+
+def _columns(frame):
+
+    return {str(key): frame[key].to_numpy() for key in frame.columns}
+
+
+def _param_dict(job):
+
+    '''Returns the ranges of the job, completed with the defaults of
+    params() in the order of its arguments.'''
+
+    import inspect
+    from .params import params
+
+    defaults = {key: value.default for key, value in inspect.signature(params).parameters.items()
+                if key not in ('show_params', 'u')}
+
+    return dict(defaults, **job['params'])
+
+
+def run_simulate(job):
+
+    import numpy as np
+    import icusim
+    from .numpy_simulator import _PARAMETERS_
+
+    p = job['params']
+
+    # ranges are drawn into a single parameter set first
+    if not all(key in p for key in _PARAMETERS_):
+        p = icusim.params_batch(1, random_seed=job.get('random_seed'), **p)
+        p = {key: p[key][0].item() for key in p}
+
+    daily = icusim.simulate(p,
+                            random_seed=job.get('random_seed'),
+                            engine=job.get('engine', 'simpy'),
+                            output='array',
+                            **job.get('simulate', {}))
+
+    out = {'day': np.arange(1, len(daily) + 1)}
+    out.update({name: daily[:, i] for i, name in enumerate(icusim.columns())})
+
+    return out
+
+
+def run_montecarlo(job):
+
+    import icusim
+
+    results = icusim.MonteCarlo(job['rounds'],
+                                job['params'],
+                                n_jobs=job.get('n_jobs', 1),
+                                random_seed=job.get('random_seed'),
+                                engine=job.get('engine', 'simpy'),
+                                **job.get('montecarlo', {}))
+
+    # without kept rounds, the streaming summary is written instead
+    if results.df is None:
+        return _columns(results.summary.dataframe(peak=True))
+
+    return _columns(results.df)
+
+
+def run_sobol(job):
+
+    import warnings
+    import icusim
+
+    # a shared spec may set these for the other commands
+    for key, default in [('engine', 'simpy'), ('n_jobs', 1)]:
+        if job.get(key, default) not in (default, None):
+            warnings.warn("sobol runs serially on the simpy engine and ignores %s=%r" % (key, job[key]))
+
+    results = icusim.SobolSensitivity(job['rounds'],
+                                      _param_dict(job),
+                                      random_seed=job.get('random_seed'),
+                                      **job.get('sobol', {}))
+
+    return _columns(results.sensitivity_table())
+
+
+def run_gridsweep(job):
+
+    import icusim
+
+    results = icusim.GridSweep(param_dict=job['params'],
+                               rounds=job['rounds'],
+                               n_jobs=job.get('n_jobs', 1),
+                               random_seed=job.get('random_seed'),
+                               engine=job.get('engine', 'simpy'),
+                               **job['gridsweep'])
+
+    return _columns(results.results)
+
+
+_COMMANDS_ = {'simulate': run_simulate,
+              'montecarlo': run_montecarlo,
+              'sobol': run_sobol,
+              'gridsweep': run_gridsweep}
+
+
+def main(argv=None):
+
+    parser = argparse.ArgumentParser(prog='icusim', description='ICU burden simulation jobs')
+    subparsers = parser.add_subparsers(dest='command')
+
+    # add_subparsers() takes required only from Python 3.7 on
+    subparsers.required = True
+
+    for command in _COMMANDS_:
+        subparser = subparsers.add_parser(command, help='run a %s job' % command)
+        subparser.add_argument('job', help='path to the JSON job spec')
+        subparser.add_argument('--output', '-o', required=True, help='.npz, .parquet or .csv file')
+        subparser.add_argument('--seed', type=int, help='overrides random_seed of the job')
+        subparser.add_argument('--rounds', type=int, help='overrides rounds of the job')
+        subparser.add_argument('--n-jobs', type=int, help='overrides n_jobs of the job')
+
+    args = parser.parse_args(argv)
+    _check_output(args.output)
+
+    with open(args.job) as f:
+        job = json.load(f)
+
+    for key, value in {'random_seed': args.seed, 'rounds': args.rounds, 'n_jobs': args.n_jobs}.items():
+        if value is not None:
+            job[key] = value
+
+    _write(args.output, _COMMANDS_[args.command](job))
+
+    return 0
@@ -0,0 +1,143 @@
+import numpy as np
+
+from .numpy_simulator import _as_columns, _batch_days, _new_statistic, admit
+
+
+def _normal_cdf(x):
+
+    from scipy.special import ndtr
+
+    return ndtr(np.asarray(x, dtype=float))
+
+
+class _Cohorts:
+
+    '''Patients of one ICU type grouped by admission hour. Each cohort
+    only keeps the number of patients still in the ward, split by
+    outcome, and the distribution of their stay end time. Takes the
+    same arguments as numpy_simulator._Ward, for a single scenario.'''
+
+    def __init__(self, scenarios, capacity, stay_duration, fatality):
+
+        if scenarios != 1:
+            raise ValueError("The cohort engine runs one scenario at a time")
+
+        self.capacity = capacity
+        self.stay_duration = float(stay_duration[0])
+        self.fatality = float(fatality[0])
+
+        # stay end time is |N(mean, scale)| or round(N(mean, scale))
+        self.mean = np.empty(0)
+        self.scale = np.empty(0)
+        self.folded = np.empty(0, dtype=bool)
+
+        self.die = np.empty(0, dtype=int)
+        self.survive = np.empty(0, dtype=int)
+        self.updated = np.empty(0)
+
+    def occupied(self):
+
+        return int(self.die.sum() + self.survive.sum())
+
+    def add(self, mean, scale, folded, die, survive):
+
+        count = len(die)
+
+        self.mean = np.concatenate([self.mean, mean])
+        self.scale = np.concatenate([self.scale, np.full(count, scale, dtype=float)])
+        self.folded = np.concatenate([self.folded, np.full(count, folded)])
+        self.die = np.concatenate([self.die, die])
+        self.survive = np.concatenate([self.survive, survive])
+        self.updated = np.concatenate([self.updated, np.full(count, -np.inf)])
+
+    def start(self, rng, count, duration, scale):
+
+        '''Places the starting patients as one cohort, following
+        generate_random_icu_ward().'''
+
+        die = rng.binomial(count, 0.5)
+        self.add(np.asarray(duration, dtype=float), scale, False, die, count - die)
+
+    def ended_probability(self, date_now):
+
+        '''Probability that the stay has ended by date_now, for every
+        cohort.'''
+
+        upper = _normal_cdf((date_now - self.mean) / self.scale)
+        lower = _normal_cdf((-date_now - self.mean) / self.scale)
+
+        # round(N(mean, scale)) <= date_now when N(mean, scale) < date_now + .5
+        rounded = _normal_cdf((date_now + 0.5 - self.mean) / self.scale)
+
+        return np.where(self.folded, np.maximum(upper - lower, 0), rounded)
+
+    def accept(self, rng, arriving, hours):
+
+        '''Places hourly arrivals as new cohorts and returns the accepted
+        and refused counts.'''
+
+        accepted = admit(self.capacity, np.atleast_1d(self.occupied()), arriving)[0]
+        admitted = accepted > 0
+
+        die = rng.binomial(accepted[admitted], self.fatality)
+        self.add(hours[admitted], self.stay_duration, True, die, accepted[admitted] - die)
+
+        total_accepted = int(accepted.sum())
+
+        return total_accepted, int(arriving.sum()) - total_accepted
+
+    def discharge(self, rng, date_now):
+
+        '''Draws the patients of each cohort whose stay ended since the
+        previous update and returns died and released counts.'''
+
+        before = self.ended_probability(self.updated)
+        now = self.ended_probability(date_now)
+
+        remaining = 1 - before
+        ended = np.divide(now - before, remaining, out=np.ones(len(now)), where=remaining > 0)
+        ended = np.clip(ended, 0, 1)
+
+        died = rng.binomial(self.die, ended)
+        released = rng.binomial(self.survive, ended)
+
+        self.die -= died
+        self.survive -= released
+        self.updated[:] = date_now
+
+        # drop cohorts that have left the ward
+        staying = (self.die + self.survive) > 0
+
+        for name in ['mean', 'scale', 'folded', 'die', 'survive', 'updated']:
+            setattr(self, name, getattr(self, name)[staying])
+
+        return int(died.sum()), int(released.sum())
+
+
+def simulate_cohort(p, random_seed=None):
+
+    '''Cohort counterpart of simulate(). Instead of individual patients,
+    each ward holds one cohort per admission hour, and deaths and
+    releases are binomial draws per cohort at the daily update. Memory
+    and time scale with the number of simulated days rather than the
+    number of patients. Returns a (day, metric) array.'''
+
+    columns = _as_columns([p])
+    statistic = _new_statistic(columns)
+
+    for day in _batch_days(columns, random_seed, statistic, ward=_Cohorts):
+        pass
+
+    return statistic[0]
+
+
+def iter_cohort(p, random_seed=None):
+
+    '''Runs simulate_cohort() day by day and yields the (metric,) array
+    of each day as soon as it is simulated.'''
+
+    columns = _as_columns([p])
+    statistic = _new_statistic(columns)
+
+    for day in _batch_days(columns, random_seed, statistic, ward=_Cohorts):
+        yield statistic[0, day].copy()
@@ -0,0 +1,175 @@
+def _axis_keys(name):
+
+    '''Returns the params() arguments an axis sets: the argument itself,
+    or the min and max of a range, which fixes the range to the value.'''
+
+    import inspect
+    from ..params import params
+
+    arguments = inspect.signature(params).parameters
+
+    if name in arguments and name not in ('show_params', 'u'):
+        return [name]
+
+    if name + '_min' in arguments and name + '_max' in arguments:
+        return [name + '_min', name + '_max']
+
+    raise ValueError("%s is not an input or range of icusim.params()" % name)
+
+
+class GridSweep:
+
+    def __init__(self,
+                 axes,
+                 param_dict,
+                 rounds,
+                 n_jobs=1,
+                 random_seed=None,
+                 engine='simpy',
+                 thresholds=None,
+                 sampling='random'):
+
+        '''Scenario grid where some inputs are fixed to every combination
+        of the values of axes and the others are drawn from the ranges of
+        param_dict, with rounds Monte Carlo rounds per cell. All cells are
+        run as one batch, and cells that come down to the same inputs
+        are simulated only once.
+
+        Returns an object that contains a tidy dataframe with the peak
+        statistics of every cell and metric (self.results), the peak-only
+        icusim.Summary of every cell (self.summaries) and cross tables
+        of a statistic over the grid (self.cube('')).
+
+        axes | dict | values of each grid axis, keyed by an input of
+                      params() or by a range name such as 'total_capacity'
+                      for total_capacity_min and total_capacity_max
+        param_dict | dict | dictionary with the input parameters
+        rounds | int | number of times the simulation is run per cell
+        n_jobs | int | number of worker processes (-1 for all cores)
+        random_seed | int | master seed; every cell uses the same
+                            per-round streams
+        engine | str | simulation engine, 'simpy', 'numpy' or 'cohort'
+        thresholds | list | values for which the share of rounds above
+                            the threshold is counted
+        sampling | str | how the ranges are drawn, see MonteCarlo; with
+                         any mode round i of every cell uses the same
+                         random numbers, so differences between cells
+                         come from the axes and not from noise
+
+        '''
+
+        import numpy as np
+
+        self.axes = {name: list(dict.fromkeys(values)) for name, values in axes.items()}
+        self.params = param_dict
+        self.rounds = rounds
+        self.n_jobs = n_jobs
+        self.engine = engine
+        self.thresholds = thresholds
+        self.sampling = sampling
+        self.random_seed = np.random.SeedSequence(random_seed).entropy
+
+        self._null = self._load_cells()
+        self._null = self._run()
+        self._null = self._dataframe()
+
+    def _load_cells(self):
+
+        import itertools
+
+        keys = {name: _axis_keys(name) for name in self.axes}
+
+        self.cells = []
+        self._runs = {}
+
+        for values in itertools.product(*self.axes.values()):
+
+            param_dict = dict(self.params)
+
+            for name, value in zip(self.axes, values):
+                param_dict.update({key: value for key in keys[name]})
+
+            # cells with the same inputs share one run
+            run = tuple(sorted(param_dict.items()))
+            self._runs.setdefault(run, param_dict)
+            self.cells.append((values, run))
+
+        return 0
+
+    def _run(self):
+
+        import icusim
+        from tqdm import tqdm
+        from ._pool import chunk_size, task_map, workers
+        from .MonteCarlo import _round_task, _run_rounds
+
+        n_jobs = workers(self.n_jobs)
+        size = chunk_size(len(self._runs) * self.rounds, n_jobs)
+
+        tasks = []
+        owners = []
+
+        for run, param_dict in self._runs.items():
+            for start in range(0, self.rounds, size):
+                stop = min(start + size, self.rounds)
+                tasks.append(_round_task(start,
+                                         stop,
+                                         self.rounds,
+                                         param_dict,
+                                         self.random_seed,
+                                         sampling=self.sampling,
+                                         engine=self.engine,
+                                         thresholds=self.thresholds,
+                                         daily_summary=False))
+                owners.append(run)
+
+        # only peaks are reported, so the cells skip the per-day sketches
+        self.summaries = {run: icusim.Summary(self.thresholds, keep_daily=False) for run in self._runs}
+
+        with task_map(n_jobs) as run_tasks, tqdm(total=len(self._runs) * self.rounds) as progress:
+            for run, (_, summary, _) in zip(owners, run_tasks(_run_rounds, tasks)):
+                self.summaries[run].merge(summary)
+                progress.update(summary.rounds)
+
+        return 0
+
+    def _dataframe(self):
+
+        import pandas as pd
+
+        out = []
+
+        for values, run in self.cells:
+
+            _temp_ = self.summaries[run].dataframe(peak=True)
+
+            for i, name in enumerate(self.axes):
+                _temp_.insert(i, name, values[i])
+
+            out.append(_temp_)
+
+        self.results = pd.concat(out, ignore_index=True)
+
+        # summaries are looked up by the axis values of a cell
+        self.summaries = {values: self.summaries[run] for values, run in self.cells}
+
+        return 0
+
+    def cube(self, metric='ventilated_icu_total_demand', statistic='mean'):
+
+        '''Returns a statistic of the peak of metric over the grid, with
+        the first axis as rows and the last axis as columns. With more
+        than two axes the rows hold every combination of the others.
+
+        metric | str | one of icusim.columns()
+        statistic | str | a column of self.results such as 'mean',
+                          'std', 'q0.95' or 'p>100'
+
+        '''
+
+        out = self.results[self.results['metric'] == metric].set_index(list(self.axes))[statistic]
+
+        if len(self.axes) > 1:
+            return out.unstack(list(self.axes)[-1])
+
+        return out
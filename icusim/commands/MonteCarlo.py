@@ -1,49 +1,605 @@
+from collections import namedtuple
+
+# rounds whose parameters are drawn together from one seed
+_BLOCK_ROUNDS_ = 1024
+
+_RoundTask = namedtuple('_RoundTask', ['start',
+                                       'stop',
+                                       'rounds',
+                                       'param_dict',
+                                       'sampling',
+                                       'entropy',
+                                       'engine',
+                                       'thresholds',
+                                       'keep_daily',
+                                       'cache',
+                                       'profile',
+                                       'stop_when',
+                                       'daily_summary'])
+
+
+def _round_seed(entropy, round_number):
+
+    '''Returns the simulate() seed of a given round, derived from the
+    master seed entropy.'''
+
+    import numpy as np
+
+    seed_sequence = np.random.SeedSequence(entropy, spawn_key=(round_number,))
+
+    return int(seed_sequence.generate_state(1)[0])
+
+
+def _design_seed(entropy):
+
+    import numpy as np
+
+    return int(np.random.SeedSequence(entropy, spawn_key=(0, 0)).generate_state(1)[0])
+
+
+def _param_block(block, param_dict, sampling, entropy, design=None):
+
+    '''Returns the parameters of the rounds in the block-th block of
+    _BLOCK_ROUNDS_ as columns, drawn from their own streams next to the
+    per-round seeds of the master seed entropy. Every sampling mode maps
+    the same seeded uniform numbers onto the ranges, so studies with
+    other ranges use common random numbers. design is the whole Latin
+    hypercube for sampling 'lhs'.'''
+
+    import numpy as np
+    import icusim
+    from ..sampling import uniform_design
+
+    first = block * _BLOCK_ROUNDS_
+    design_seed, params_seed = [int(seed) for seed in
+                                np.random.SeedSequence(entropy, spawn_key=(0, 0, block)).generate_state(2)]
+
+    u = None
+
+    if sampling == 'antithetic':
+        u = uniform_design(_BLOCK_ROUNDS_, sampling, design_seed)
+
+    # Sobol points and the hypercube span all blocks
+    elif sampling == 'sobol':
+        u = uniform_design(_BLOCK_ROUNDS_, sampling, _design_seed(entropy), skip=first)
+
+    elif sampling == 'lhs':
+        u = design[first:first + _BLOCK_ROUNDS_]
+
+    return icusim.params_batch(_BLOCK_ROUNDS_ if u is None else len(u),
+                               random_seed=params_seed,
+                               u=u,
+                               **param_dict)
+
+
+def _param_rows(start, stop, rounds, param_dict, sampling, entropy):
+
+    '''Yields the params() dict of every round in range(start, stop) of
+    a study of rounds rounds, drawing one block of rounds at a time so
+    that memory does not grow with rounds. Only sampling 'lhs' builds
+    the whole design, as a Latin hypercube depends on every round.'''
+
+    from ..sampling import _SAMPLING_, uniform_design
+
+    if sampling not in _SAMPLING_:
+        raise ValueError("sampling must be one of " + ', '.join(_SAMPLING_))
+
+    design = None
+
+    if sampling == 'lhs':
+        design = uniform_design(rounds, sampling, _design_seed(entropy))
+
+    for block in range(start // _BLOCK_ROUNDS_, -(-stop // _BLOCK_ROUNDS_)):
+
+        param_table = _param_block(block, param_dict, sampling, entropy, design)
+        first = block * _BLOCK_ROUNDS_
+
+        for round_number in range(max(start, first), min(stop, first + _BLOCK_ROUNDS_)):
+            i = round_number - first
+            yield {key: param_table[key][i].item() for key in param_table}
+
+
+def _round_task(start,
+                stop,
+                rounds,
+                param_dict,
+                entropy,
+                sampling='random',
+                engine='simpy',
+                thresholds=None,
+                keep_daily=False,
+                cache=None,
+                profile=False,
+                stop_when=None,
+                daily_summary=True):
+
+    '''Returns the task of _run_rounds() for the rounds in range(start,
+    stop) of a study of rounds rounds.
+
+    keep_daily | bool | if True, the daily results of every round are
+                        returned, otherwise only their Summary
+    daily_summary | bool | if False, the Summary only keeps the peaks
+
+    The other arguments are those of MonteCarlo.
+
+    '''
+
+    return _RoundTask(start, stop, rounds, param_dict, sampling, entropy, engine,
+                      thresholds, keep_daily, cache, profile, stop_when, daily_summary)
+
+
+def _run_rounds(task):
+
+    '''Runs the rounds of a _round_task() and returns the daily results
+    for each round in order, together with their Summary and Profile,
+    which is None unless profiling.'''
+
+    import icusim
+    from ..profiling import Profile
+
+    out = []
+    summary = icusim.Summary(task.thresholds, keep_daily=task.daily_summary)
+    counters = Profile() if task.profile else None
+
+    param_rows = _param_rows(task.start, task.stop, task.rounds, task.param_dict, task.sampling, task.entropy)
+
+    for round_number, p in zip(range(task.start, task.stop), param_rows):
+
+        simulate_seed = _round_seed(task.entropy, round_number)
+
+        results = icusim.simulate(p,
+                                  random_seed=simulate_seed,
+                                  engine=task.engine,
+                                  cache=task.cache,
+                                  output='array',
+                                  profile=counters.merge if task.profile else None,
+                                  stop_when=task.stop_when)
+        summary.update(results)
+
+        if task.keep_daily:
+            out.append(results)
+
+    return out, summary, counters
+
+
 class MonteCarlo:
-    
-    def __init__(self, rounds, param_dict):
-        
+
+    def __init__(self,
+                 rounds,
+                 param_dict,
+                 n_jobs=1,
+                 random_seed=None,
+                 engine='simpy',
+                 trajectory_path=None,
+                 thresholds=None,
+                 keep_results=True,
+                 cache=None,
+                 checkpoint_path=None,
+                 checkpoint_every=1000,
+                 resume=None,
+                 target_metric=None,
+                 target_statistic='mean',
+                 target_width=None,
+                 target_quantile=.5,
+                 target_threshold=None,
+                 confidence=.95,
+                 batch_size=500,
+                 sampling='random',
+                 profile=False,
+                 shard=None,
+                 shard_path=None,
+                 stop_when=None):
+
         '''Monte Carlo method for multi-round simulations.
-        Returns and object that contains a dataframe with 
+        Returns and object that contains a dataframe with
         simulation results (self.df).
-        
+
         rounds | int | number of times the simulation will be run
         param_dict | dict | dictionary with the input parameters
-        
+        n_jobs | int | number of worker processes (-1 for all cores)
+        random_seed | int | master seed from which every round gets
+                            its own random stream
+        engine | str | simulation engine, 'simpy', 'numpy' or 'cohort'
+        trajectory_path | str | if set, the daily results of every round
+                                are streamed into a (round, day, metric)
+                                .npy file at this path, which can be read
+                                with icusim.load_trajectories()
+        thresholds | list | values for which self.summary counts how
+                            often results exceed them
+        keep_results | bool | if False, only the streaming self.summary
+                              is kept and self.df is not created, so
+                              memory does not grow with rounds
+        cache | str or ResultCache | on-disk cache for the rounds, so
+                                     rerunning with the same seed reads
+                                     the results from disk; needs
+                                     random_seed (or resume)
+        checkpoint_path | str | if set, completed rounds are saved to
+                                this file every checkpoint_every rounds
+        checkpoint_every | int | number of rounds between checkpoints
+        resume | str | checkpoint file to continue from; finished rounds
+                       are skipped and checkpoints keep going to the
+                       same file unless checkpoint_path is given
+        target_metric | str | if set together with target_width, rounds
+                              are run in batches until the confidence
+                              interval of the peak of this metric is
+                              narrower than target_width, with rounds as
+                              the budget
+        target_statistic | str | 'mean', 'quantile' or 'exceedance'
+        target_width | float | width of the confidence interval to reach
+        target_quantile | float | quantile for target_statistic 'quantile'
+        target_threshold | float | threshold for 'exceedance'
+        confidence | float | confidence level of the interval
+        batch_size | int | rounds between precision checks
+        sampling | str | how the parameters are drawn: 'random' draws
+                         each round independently, 'antithetic' pairs
+                         each round with its mirror image, and 'lhs' and
+                         'sobol' spread the rounds evenly over the ranges
+                         with a Latin hypercube or a Sobol sequence. Every
+                         mode maps seeded uniform numbers onto the ranges,
+                         so runs with the same random_seed and different
+                         params use common random numbers. A Latin
+                         hypercube depends on all rounds, so 'lhs' keeps
+                         the whole design in memory and can only resume
+                         with the same rounds
+        profile | bool | if True, the phase timings and counters of
+                         simulate(profile=True) are summed over all rounds
+                         into self.profile (simpy engine only)
+        shard | tuple | (index, count) to run only the index-th of count
+                        consecutive ranges of the rounds, so a study can
+                        be split over hosts; needs random_seed
+        shard_path | str | shared directory into which a shard writes its
+                           results, combined with MonteCarlo.merge()
+        stop_when | callable | ends each round early as in simulate(), for
+                               example icusim.exceeds(); peaks cover the
+                               simulated days, and later days are NaN in
+                               the trajectories and left out of the daily
+                               summary. With n_jobs > 1 it must be
+                               picklable, so not a lambda
+
+        With a target, the number of rounds that was needed is kept in
+        self.rounds_used, and the estimate and its interval in
+        self.estimate and self.ci.
+
+        Per-day and peak means, variances, quantiles and exceedance
+        shares are always available in self.summary (icusim.Summary).
+        The results are identical for a given random_seed regardless
+        of n_jobs. The seed that was used is kept in self.random_seed.
+
         '''
 
+        import numpy as np
+        from ..cache import ResultCache
+
         self.rounds = rounds
         self.params = param_dict
+        self.n_jobs = n_jobs
+        self.engine = engine
+        self.trajectory_path = trajectory_path
+        self.thresholds = thresholds
+        self.keep_results = keep_results
+        self.cache = cache
+        self.checkpoint_path = checkpoint_path or resume
+        self.checkpoint_every = checkpoint_every
+        self.target_metric = target_metric
+        self.target_statistic = target_statistic
+        self.target_width = target_width
+        self.target_quantile = target_quantile
+        self.target_threshold = target_threshold
+        self.confidence = confidence
+        self.batch_size = batch_size
+        self.sampling = sampling
+        self._profile = profile
+        self.stop_when = stop_when
+        self.shard = shard
+        self.shard_path = shard_path
+        self.random_seed = np.random.SeedSequence(random_seed).entropy
+        self._resume_state = None
+        self._first, self._stop = 0, rounds
+
+        # the target is checked before any rounds run
+        if target_statistic not in ('mean', 'quantile', 'exceedance'):
+            raise ValueError("target_statistic must be 'mean', 'quantile' or 'exceedance'")
+
+        if self._adaptive() and target_statistic == 'exceedance' and target_threshold is None:
+            raise ValueError("target_statistic 'exceedance' needs target_threshold")
+
+        if profile and stop_when is not None:
+            raise ValueError("profile and stop_when cannot be combined")
+
+        # unseeded rounds are never repeated, so caching them only fills the cache
+        if cache is not None and random_seed is None and resume is None:
+            raise ValueError("cache needs random_seed")
+
+        # a single instance counts the size of the cache only once
+        if cache is not None and not isinstance(cache, ResultCache):
+            self.cache = ResultCache(cache)
+
+        if shard is not None:
+            from ..shards import shard_range
+
+            # every shard must draw the same study from the same seed
+            if random_seed is None or shard_path is None:
+                raise ValueError("A shard needs random_seed and shard_path")
+
+            if self._adaptive():
+                raise ValueError("A target precision cannot be used with shards")
+
+            self._first, self._stop = shard_range(rounds, shard)
+
+        if resume is not None:
+            self._null = self._load_checkpoint(resume)
+
         self._null = self.run()
         self._null = self.dataframe()
 
+        if shard is not None:
+            self._null = self._save_shard()
+
     def load_params(self):
-        
+
         import icusim
-    
+
         return icusim.params(**self.params)
-    
-    
+
+    def _load_checkpoint(self, path):
+
+        from ..checkpoint import load_checkpoint
+
+        state = load_checkpoint(path)
+
+        if (state['params'] != self.params
+                or state['engine'] != self.engine
+                or state.get('sampling', 'random') != self.sampling):
+            raise ValueError("The checkpoint was made with different params, engine or sampling")
+
+        # the other designs keep their first rows for any number of rounds
+        if self.sampling == 'lhs' and state['rounds'] != self.rounds:
+            raise ValueError("A checkpoint with sampling 'lhs' must resume with the same rounds")
+
+        # the master seed defines the random stream of every round
+        self.random_seed = state['random_seed']
+        self._resume_state = state
+
+        return 0
+
+    def _save_checkpoint(self):
+
+        from ..checkpoint import save_checkpoint
+
+        # rows counted as completed must be on disk before the checkpoint
+        if self._trajectories is not None:
+            self._trajectories.flush()
+
+        state = {'rounds': self.rounds,
+                 'params': self.params,
+                 'engine': self.engine,
+                 'sampling': self.sampling,
+                 'random_seed': self.random_seed,
+                 'completed': self._saved,
+                 'out': self.out,
+                 'summary': self.summary,
+                 'target_values': self._target_values,
+                 'profile': self.profile}
+
+        save_checkpoint(self.checkpoint_path, state)
+
+    def _study(self):
+
+        return {'rounds': self.rounds,
+                'params': self.params,
+                'engine': self.engine,
+                'sampling': self.sampling,
+                'random_seed': self.random_seed,
+                'thresholds': self.thresholds,
+                'keep_results': self.keep_results,
+                'profile': self._profile}
+
+    def _save_shard(self):
+
+        from ..shards import save_shard
+
+        save_shard(self.shard_path, 'MonteCarlo', self.shard, self._study(),
+                   {'start': self._first,
+                    'stop': self._stop,
+                    'out': self.out,
+                    'summary': self.summary,
+                    'profile': self.profile})
+
+        return 0
+
+    @classmethod
+    def merge(cls, path):
+
+        '''Combines the shards of a study written by
+        MonteCarlo(shard=..., shard_path=...) into the object a single
+        run with the same random_seed would return, with self.df,
+        self.summary and self.profile over all rounds.
+
+        path | str or list | shared directory of the shards, or a list
+                             of shard files
+
+        '''
+
+        import icusim
+        from ..shards import load_shards
+
+        states = load_shards(path, 'MonteCarlo')
+        study = states[0]['study']
+
+        self = cls.__new__(cls)
+        self.rounds = self.rounds_used = study['rounds']
+        self.params = study['params']
+        self.engine = study['engine']
+        self.sampling = study['sampling']
+        self.random_seed = study['random_seed']
+        self.thresholds = study['thresholds']
+        self.keep_results = study['keep_results']
+        self.shard = None
+        self.out = []
+        self.summary = icusim.Summary(self.thresholds)
+        self.profile = None
+
+        for state in states:
+            results = state['results']
+            self.out += results['out']
+            self.summary.merge(results['summary'])
+
+            if results['profile'] is not None:
+                self.profile = results['profile'] if self.profile is None else self.profile.merge(results['profile'])
+
+        self._null = self.dataframe()
+
+        return self
+
+    def _tasks(self, completed, rounds):
+
+        from ._pool import chunk_size, workers
+
+        size = chunk_size(rounds - completed, workers(self.n_jobs))
+
+        if self.checkpoint_path is not None:
+            size = min(size, self.checkpoint_every)
+
+        tasks = []
+
+        for start in range(completed, rounds, size):
+            stop = min(start + size, rounds)
+            tasks.append(_round_task(start,
+                                     stop,
+                                     self.rounds,
+                                     self.params,
+                                     self.random_seed,
+                                     sampling=self.sampling,
+                                     engine=self.engine,
+                                     thresholds=self.thresholds,
+                                     keep_daily=self.keep_results or self.trajectory_path is not None or self._adaptive(),
+                                     cache=self.cache,
+                                     profile=self._profile,
+                                     stop_when=self.stop_when))
+
+        return tasks
+
+    def _adaptive(self):
+
+        return self.target_metric is not None and self.target_width is not None
+
+    def _target_reached(self):
+
+        from ..summary import confidence_interval
+
+        self.estimate, low, high = confidence_interval(self._target_values,
+                                                       self.target_statistic,
+                                                       self.confidence,
+                                                       self.target_quantile,
+                                                       self.target_threshold)
+        self.ci = (low, high)
+
+        return high - low <= self.target_width
+
     def run(self):
-    
+
         import icusim
         from tqdm import tqdm
-        import pandas as pd
+        from ..profiling import Profile
+        from ._pool import task_map, workers
 
         self.out = []
+        self.summary = icusim.Summary(self.thresholds)
+        self._trajectories = None
+        self._saved = self._first
+        self._target_values = []
+        self.profile = Profile() if self._profile else None
 
-        for i in tqdm(range(self.rounds)):
+        if self._resume_state is not None:
+            self.out = self._resume_state['out']
+            self.summary = self._resume_state['summary']
+            self._saved = self._resume_state['completed']
+            self._target_values = self._resume_state['target_values']
+            self.profile = self._resume_state.get('profile', self.profile)
 
-            results = icusim.simulate(self.load_params())
-            df = icusim.stats_to_dataframe(results)
-            self.out.append(df.max().tolist())
+        if self._adaptive():
+            self._target_index = list(icusim.columns()).index(self.target_metric)
+
+        with task_map(workers(self.n_jobs)) as run_tasks:
+            with tqdm(total=self._stop - self._first, initial=self._saved - self._first) as progress:
+
+                while self._saved < self._stop:
+
+                    # without a target, all rounds make up a single batch
+                    stop = self._stop
+
+                    if self._adaptive():
+                        stop = min(self._saved + self.batch_size, self.rounds)
+
+                    self._collect(run_tasks(_run_rounds, self._tasks(self._saved, stop)), progress)
+
+                    if self._adaptive() and self._target_reached():
+                        break
+
+        self.rounds_used = self._saved - self._first
+
+        if self._trajectories is not None:
+            self._trajectories.flush()
+            self._trajectories = None
 
         return 0
-            
+
+    def _collect(self, results, progress):
+
+        import numpy as np
+
+        for out, summary, counters in results:
+            for i, daily in enumerate(out):
+                self._save_trajectory(self._saved + i, daily)
+
+                if self._adaptive():
+                    self._target_values.append(np.nanmax(daily[:, self._target_index]))
+
+                # rounds stopped early are NaN after their last day, but
+                # their peaks are counts like those of full rounds
+                if self.keep_results:
+                    self.out.append(np.nanmax(daily, axis=0).astype(int).tolist())
+
+            self._saved += summary.rounds
+            self.summary.merge(summary)
+
+            if counters is not None:
+                self.profile.merge(counters)
+            progress.update(summary.rounds)
+
+            if self.checkpoint_path is not None:
+                self._save_checkpoint()
+
+    def _save_trajectory(self, round_number, daily):
+
+        if self.trajectory_path is None:
+            return
+
+        from ..trajectories import open_trajectories, resize_trajectories
+
+        # a shard only writes its own rounds
+        rounds = self._stop - self._first
+
+        # a resumed run keeps writing into the rounds saved so far
+        if self._trajectories is None and self._saved > self._first:
+            self._trajectories = resize_trajectories(self.trajectory_path, rounds)
+
+        if self._trajectories is None:
+            self._trajectories = open_trajectories(self.trajectory_path,
+                                                   rounds,
+                                                   *daily.shape)
+
+        self._trajectories[round_number - self._first] = daily
+
     def dataframe(self):
-        
+
         import pandas as pd
         import icusim
-    
+
+        if not self.keep_results:
+            self.df = None
+            return 0
+
         self.df = pd.DataFrame(self.out)
         self.df.columns = icusim.columns()
 
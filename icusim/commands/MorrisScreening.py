@@ -0,0 +1,203 @@
+def _run_params(task):
+
+    '''Simulates the given parameter sets, numbered from start, and
+    returns the peak of every metric for each.'''
+
+    import icusim
+    from .MonteCarlo import _round_seed
+
+    start, param_list, entropy, engine = task
+
+    out = []
+
+    for i, p in enumerate(param_list):
+
+        simulate_seed = _round_seed(entropy, start + i)
+
+        results = icusim.simulate(p, random_seed=simulate_seed, engine=engine, output='array')
+        out.append(results.max(axis=0).tolist())
+
+    return out
+
+
+class MorrisScreening:
+
+    def __init__(self,
+                 rounds,
+                 param_dict,
+                 n_jobs=1,
+                 random_seed=None,
+                 engine='simpy',
+                 num_levels=4):
+
+        '''Morris elementary effects screening, where one parameter at a
+        time is changed along random trajectories through the parameter
+        ranges. Needs far fewer rounds than SobolSensitivity and is
+        used to find the parameters that barely move the outputs.
+
+        Returns an object that contains the screening results
+        (self.screening('')), a dataframe with simulation results
+        (self.results) and a reduced param_dict for SobolSensitivity
+        (self.reduced_params()).
+
+        rounds | int | number of times the simulation will be run; each
+                       trajectory takes num_vars + 1 rounds
+        param_dict | dict | dictionary with the input parameters
+        n_jobs | int | number of worker processes (-1 for all cores)
+        random_seed | int | master seed from which every round gets
+                            its own random stream
+        engine | str | simulation engine, 'simpy', 'numpy' or 'cohort'
+        num_levels | int | number of grid levels of each parameter
+
+        '''
+
+        import numpy as np
+
+        self._rounds = rounds
+        self._params = param_dict
+        self._n_jobs = n_jobs
+        self._engine = engine
+        self._num_levels = num_levels
+        self.random_seed = np.random.SeedSequence(random_seed).entropy
+
+        self._null = self._load_params()
+        self._null = self._run()
+        self._null = self._dataframe()
+
+    def _load_params(self):
+
+        import numpy as np
+        from SALib.sample import morris
+        from .SobolSensitivity import _problem, _round_params
+
+        self.problem, self._fixed = _problem(self._params)
+
+        _trajectories_ = self._rounds // (self.problem['num_vars'] + 1)
+
+        if _trajectories_ < 2:
+            raise ValueError("rounds must be at least %d" % (2 * (self.problem['num_vars'] + 1)))
+
+        seed = int(np.random.SeedSequence(self.random_seed, spawn_key=(0, 0)).generate_state(1)[0])
+
+        self._param_values = morris.sample(self.problem,
+                                           _trajectories_,
+                                           num_levels=self._num_levels,
+                                           seed=seed)
+
+        self._params_ = [_round_params(self._params, self.problem['names'], values, self._fixed)
+                         for values in self._param_values]
+
+        return 0
+
+    def _run(self):
+
+        from tqdm import tqdm
+        from ._pool import chunk_size, task_map, workers
+
+        n_jobs = workers(self._n_jobs)
+        size = chunk_size(len(self._params_), n_jobs)
+
+        tasks = [(start, self._params_[start:start + size], self.random_seed, self._engine)
+                 for start in range(0, len(self._params_), size)]
+
+        self.out = []
+
+        with task_map(n_jobs) as run_tasks, tqdm(total=len(self._params_)) as progress:
+            for out in run_tasks(_run_params, tasks):
+                self.out += out
+                progress.update(len(out))
+
+        return 0
+
+    def _dataframe(self):
+
+        import pandas as pd
+        import icusim
+
+        self.results = pd.DataFrame(self.out)
+        self.results.columns = icusim.columns()
+
+        del self.out
+
+        return 0
+
+    def screening(self, metric='standard_icu_total_demand'):
+
+        '''Returns the mean absolute elementary effect (mu_star), its
+        confidence interval and the spread of the effects (sigma) of
+        each parameter for a given outcome, most influential first.
+        A large sigma points to interactions or nonlinear effects.'''
+
+        import pandas as pd
+        from SALib.analyze import morris
+
+        Si = morris.analyze(self.problem,
+                            self._param_values,
+                            self.results[metric].values.astype(float),
+                            num_levels=self._num_levels,
+                            seed=self.random_seed % 2 ** 32)
+
+        _temp_ = {'mu': Si['mu'],
+                  'mu_star': Si['mu_star'],
+                  'mu_star_confidence': Si['mu_star_conf'],
+                  'sigma': Si['sigma']}
+
+        out = pd.DataFrame(_temp_, index=self.problem['names'])
+
+        return out.sort_values('mu_star', ascending=False)
+
+    def reduced_params(self, metric=None, keep=None, threshold=.1):
+
+        '''Returns a copy of param_dict where the parameters that were
+        screened out have min and max both set to the middle of their
+        range, so SobolSensitivity keeps them fixed.
+
+        metric | str | outcome to screen on; by default a parameter is
+                       kept if it matters for any of icusim.columns()
+        keep | int | number of most influential parameters to keep
+        threshold | float | if keep is not set, parameters are kept when
+                            their mu_star is at least this share of the
+                            largest mu_star
+
+        '''
+
+        import numpy as np
+        import icusim
+
+        metrics = list(icusim.columns()) if metric is None else [metric]
+
+        # mu_star relative to the most influential parameter per metric
+        importance = np.zeros(self.problem['num_vars'])
+
+        for metric in metrics:
+            mu_star = self.screening(metric).reindex(self.problem['names'])['mu_star'].values
+
+            if np.nanmax(mu_star) > 0:
+                importance = np.fmax(importance, mu_star / np.nanmax(mu_star))
+
+        if keep is not None:
+            kept = np.argsort(-importance)[:keep]
+        else:
+            kept = np.flatnonzero(importance >= threshold)
+
+        out = dict(self._params)
+
+        for i, name in enumerate(self.problem['names']):
+
+            if i not in kept:
+                low, high = self.problem['bounds'][i]
+                out[name + '_min'] = out[name + '_max'] = (low + high) / 2
+
+        return out
+
+    def sobol(self, rounds, metric=None, keep=None, threshold=.1, **kwargs):
+
+        '''Runs SobolSensitivity on the parameters kept by
+        reduced_params(), with the same random_seed unless another one
+        is given in kwargs.'''
+
+        from .SobolSensitivity import SobolSensitivity
+
+        kwargs.setdefault('random_seed', self.random_seed)
+
+        return SobolSensitivity(rounds, self.reduced_params(metric, keep, threshold), **kwargs)
@@ -1,122 +1,598 @@
+def _ranges(param_dict):
+
+    '''Returns the [min, max] of every parameter in param_dict, keyed
+    by the name without the _min or _max suffix.'''
+
+    out = {}
+
+    # convert to salib problem format
+    for key in param_dict.keys():
+
+        # the below assumes that min is always before max
+        if 'min' in key:
+            out[key[:-4]] = [param_dict[key]]
+
+        elif 'max' in key:
+            out[key[:-4]] += [param_dict[key]]
+
+    return out
+
+
+def _problem(param_dict):
+
+    '''Returns the SALib problem of the parameters whose min and max
+    differ, and the values of those where they are the same.'''
+
+    out = _ranges(param_dict)
+    fixed = {key: out[key][0] for key in out if out[key][0] == out[key][1]}
+
+    problem = {}
+    problem['names'] = [key for key in out if key not in fixed]
+    problem['num_vars'] = len(problem['names'])
+    problem['bounds'] = [out[key] for key in problem['names']]
+
+    return problem, fixed
+
+
+def _round_params(param_dict, names, values, fixed):
+
+    '''Returns the simulate() input for one row of a sample.'''
+
+    _temp_dict_ = {}
+    _temp_dict_['initial_patient_count'] = param_dict['initial_patient_count']
+    _temp_dict_['days_to_simulate'] = param_dict['days_to_simulate']
+    _temp_dict_.update(fixed)
+
+    for ii, key in enumerate(names):
+
+        _temp_dict_[key] = values[ii]
+
+    _standard_capacity_ = _temp_dict_['total_capacity'] * _temp_dict_['ventilated_icu_share']
+
+    _temp_dict_['standard_capacity'] = _standard_capacity_
+    _temp_dict_['ventilated_capacity'] = _temp_dict_['total_capacity'] - _standard_capacity_
+    _temp_dict_['ventilated_duration'] = _temp_dict_['standard_duration'] * _temp_dict_['ventilated_duration_factor']
+
+    return _temp_dict_
+
+
+def _saltelli_indices(Y, num_vars, second_order, resamples=100, confidence=.95, random_seed=None):
+
+    '''Returns first-order and total indices and the half widths of
+    their confidence intervals, each with shape (input, output), for
+    outputs Y with shape (round, output) evaluated on a Saltelli
+    sample. The bootstrap draws the same rows for every output.'''
+
+    import numpy as np
+    from scipy.stats import norm
+
+    block = num_vars * (2 if second_order else 1) + 2
+    Y = np.asarray(Y, dtype=float)
+
+    # the first-order estimator is sensitive to the mean of the output
+    Y = (Y - Y.mean(axis=0)).reshape(-1, block, Y.shape[-1])
+
+    A = Y[:, 0]
+    B = Y[:, -1]
+    AB = Y[:, 1:num_vars + 1]
+
+    def _indices_(rows):
+
+        a, b, ab = A[rows], B[rows], AB[rows]
+        variance = np.var(np.concatenate([a, b]), axis=0)
+
+        # Saltelli (2010) first-order and Jansen total estimators
+        first = np.mean(b[:, None] * (ab - a[:, None]), axis=0)
+        total = 0.5 * np.mean((a[:, None] - ab) ** 2, axis=0)
+
+        return (np.divide(first, variance, out=np.full(first.shape, np.nan), where=variance > 0),
+                np.divide(total, variance, out=np.full(total.shape, np.nan), where=variance > 0))
+
+    first, total = _indices_(np.arange(len(Y)))
+
+    rng = np.random.default_rng(random_seed)
+    samples = [_indices_(rng.integers(0, len(Y), len(Y))) for i in range(resamples)]
+
+    z = norm.ppf(0.5 + confidence / 2)
+    first_confidence = z * np.nanstd([s[0] for s in samples], axis=0, ddof=1)
+    total_confidence = z * np.nanstd([s[1] for s in samples], axis=0, ddof=1)
+
+    return first, first_confidence, total, total_confidence
+
+
 class SobolSensitivity:
-    
-    def __init__(self, rounds, param_dict):
-             
-        '''Sobol Sensitivity analysis where Saltelli sampling is 
+
+    def __init__(self,
+                 rounds,
+                 param_dict,
+                 random_seed=None,
+                 checkpoint_path=None,
+                 checkpoint_every=1000,
+                 resume=None,
+                 surrogate=False,
+                 surrogate_degree=2,
+                 second_order=False,
+                 convergence_metric='standard_icu_total_demand',
+                 keep_daily=False,
+                 shard=None,
+                 shard_path=None):
+
+        '''Sobol Sensitivity analysis where Saltelli sampling is
         first performed to get the parameter combinations.
 
         Returns and object that contains the sensitivity analysis
-        capability (self.sensitivity('')) and a dataframe with 
-        simulation results (self.df). 
-        
-        rounds | int | number of times the simulation will be run
+        capability (self.sensitivity('')) and a dataframe with
+        simulation results (self.df).
+
+        rounds | int | number of times the simulation will be run; the
+                       Saltelli sample has num_vars + 2 rounds per point
+                       (2 * num_vars + 2 with second_order), so rounds is
+                       rounded down to a whole number of points
         param_dict | dict | dictionary with the input parameters
-        
+        random_seed | int | master seed from which every round gets
+                            its own random stream
+        checkpoint_path | str | if set, the Saltelli sample and completed
+                                rounds are saved to this file every
+                                checkpoint_every rounds
+        checkpoint_every | int | number of rounds between checkpoints
+        resume | str | checkpoint file to continue from; finished rounds
+                       are skipped and checkpoints keep going to the
+                       same file unless checkpoint_path is given
+        surrogate | bool | if True, the rounds are spread evenly over the
+                           parameter ranges and sensitivity() computes the
+                           indices from a polynomial chaos expansion fitted
+                           to them, which needs far fewer rounds than the
+                           Saltelli sample
+        surrogate_degree | int | highest degree of the expansion; the
+                                 rounds must exceed the number of terms
+
+        second_order | bool | if True, the sample also supports
+                              second-order indices, available through
+                              sensitivity(metric, second_order=True)
+        convergence_metric | str | metric whose indices are recorded in
+                                   self.convergence after the first run
+                                   and after every extend()
+
+        keep_daily | bool | if True, the daily results of every round
+                            are kept in self.daily with shape (round,
+                            day, metric) for sensitivity_table(daily=True)
+        shard | tuple | (index, count) to run only the index-th of count
+                        consecutive ranges of the rounds, so a study can
+                        be split over hosts; needs random_seed
+        shard_path | str | shared directory into which a shard writes its
+                           results, combined with SobolSensitivity.merge()
+
+        More rounds can be added later with extend(), which simulates
+        only the new rounds. With a surrogate, the leave-one-out Q2 of
+        each fitted metric is kept in self.validation. A shard only
+        holds its own rows in self.results; the indices come from the
+        merged object.
+
         '''
 
+        import numpy as np
+
         self._rounds = rounds
         self._params = param_dict
         self._initial_patient_count = param_dict['initial_patient_count']
         self._days_to_simulate = param_dict['days_to_simulate']
+        self._checkpoint_path = checkpoint_path or resume
+        self._checkpoint_every = checkpoint_every
+        self.random_seed = np.random.SeedSequence(random_seed).entropy
+        self._surrogate = surrogate
+        self._surrogate_degree = surrogate_degree
+        self._second_order = second_order
+        self._convergence_metric = convergence_metric
+        self.validation = {}
+        self.convergence = None
+        self._keep_daily = keep_daily
+        self._daily = []
+        self.out = []
+        self.shard = shard
+        self._shard_path = shard_path
+
+        # every shard must draw the same sample from the same seed
+        if shard is not None and (random_seed is None or shard_path is None):
+            raise ValueError("A shard needs random_seed and shard_path")
+
+        if resume is not None:
+            self._null = self._load_checkpoint(resume)
+        else:
+            self._null = self._load_params()
+
+        self._first, self._stop = 0, self._rounds
+
+        if shard is not None:
+            from ..shards import shard_range
+            self._first, self._stop = shard_range(self._rounds, shard)
+
+        self._null = self._run()
+        self._null = self._dataframe()
+
+        if shard is not None:
+            self._null = self._save_shard()
+        else:
+            self._null = self._track_convergence()
+
+        del self.out
+
+    def _study(self):
+
+        return {'rounds': self._rounds,
+                'params': self._params,
+                'random_seed': self.random_seed,
+                'surrogate': self._surrogate,
+                'surrogate_degree': self._surrogate_degree,
+                'second_order': self._second_order,
+                'convergence_metric': self._convergence_metric,
+                'keep_daily': self._keep_daily}
+
+    def _save_shard(self):
+
+        from ..shards import save_shard
+
+        save_shard(self._shard_path, 'SobolSensitivity', self.shard, self._study(),
+                   {'start': self._first,
+                    'stop': self._stop,
+                    'out': self.out,
+                    'daily': self._daily})
+
+        return 0
+
+    @classmethod
+    def merge(cls, path):
+
+        '''Combines the shards of a study written by
+        SobolSensitivity(shard=..., shard_path=...) into the object a
+        single run with the same random_seed would return.
+
+        path | str or list | shared directory of the shards, or a list
+                             of shard files
+
+        '''
+
+        from ..shards import load_shards
+
+        states = load_shards(path, 'SobolSensitivity')
+        study = states[0]['study']
+
+        self = cls.__new__(cls)
+        self._rounds = study['rounds']
+        self._params = study['params']
+        self._initial_patient_count = self._params['initial_patient_count']
+        self._days_to_simulate = self._params['days_to_simulate']
+        self._checkpoint_path = None
+        self.random_seed = study['random_seed']
+        self._surrogate = study['surrogate']
+        self._surrogate_degree = study['surrogate_degree']
+        self._second_order = study['second_order']
+        self._convergence_metric = study['convergence_metric']
+        self._keep_daily = study['keep_daily']
+        self.validation = {}
+        self.convergence = None
+        self.shard = None
+        self.out = []
+        self._daily = []
+
+        for state in states:
+            self.out += state['results']['out']
+            self._daily += state['results']['daily']
+
+        self._null = self._load_params()
+        self._first, self._stop = 0, self._rounds
+        self._null = self._dataframe()
+        self._null = self._track_convergence()
+
+        del self.out
+
+        return self
+
+    def extend(self, rounds):
+
+        '''Adds rounds to the analysis, extending the sample with the
+        next points of the same sequence, so only the new rounds are
+        simulated. The indices of convergence_metric are then recorded
+        in self.convergence.
+
+        rounds | int | number of rounds to add
+
+        '''
+
+        if self.shard is not None:
+            raise ValueError("A shard cannot be extended, extend the merged object instead")
+
+        self.out = self.results.values.tolist()
+        self._rounds = len(self.out) + rounds
+
         self._null = self._load_params()
+        self._first, self._stop = 0, self._rounds
         self._null = self._run()
         self._null = self._dataframe()
+        self._null = self._track_convergence()
 
         del self.out
-        
-    def _load_params(self):
-        
-        out = {}
 
-        # convert to salib problem format
-        for key in self._params.keys():
+        return self
 
-            # the below assumes that min is always before max
-            if 'min' in key:
-                out[key[:-4]] = [self._params[key]]
+    def _load_params(self):
 
-            elif 'max' in key:
-                out[key[:-4]] += [self._params[key]]
+        # parameters with min equal to max stay out of the sample
+        self.problem, self._fixed = _problem(self._params)
 
-        # define the problem for sampling
-        self.problem = {}
-        self.problem['num_vars'] = len(out.keys())
-        self.problem['names'] = list(out.keys())
-        self.problem['bounds'] = [out[i] for i in out]
+        if self._surrogate:
+            return self._load_design()
 
         # generate samples
-        from SALib.sample import saltelli
-
-        # this required by the sampling method (?!)
-
-        _remnant_ = self._rounds % 8
-        _sample_size_ = int((self._rounds - _remnant_) / 8)
-
-        # draw the sample
-        param_values = saltelli.sample(self.problem, _sample_size_, calc_second_order=False)
-
-        self._params_ = []
-        _temp_dict_ = {}
-
-        for i in range(len(param_values)):
-            
-            self._labels = []
-            _temp_dict_ = {}
-            _temp_dict_['initial_patient_count'] = self._initial_patient_count
-            _temp_dict_['days_to_simulate'] = self._days_to_simulate
-            
-            for ii, key in enumerate(list(out.keys())):
-
-                _temp_dict_[key] = param_values[i][ii]
-            
-            _standard_capacity_ = _temp_dict_['total_capacity'] * _temp_dict_['ventilated_icu_share']
-            
-            _temp_dict_['standard_capacity'] = _standard_capacity_
-            _temp_dict_['ventilated_capacity'] = _temp_dict_['total_capacity'] - _standard_capacity_
-            _temp_dict_['ventilated_duration'] = _temp_dict_['standard_duration'] * _temp_dict_['ventilated_duration_factor']
-            
-            self._params_.append(_temp_dict_)
+        from SALib.sample import sobol
+
+        # each point of the sequence takes a block of rounds
+        _block_ = self.problem['num_vars'] * (2 if self._second_order else 1) + 2
+        _sample_size_ = self._rounds // _block_
+
+        if _sample_size_ == 0:
+            raise ValueError("rounds must be at least %d" % _block_)
+
+        self._rounds = _sample_size_ * _block_
+
+        # a larger sample from the same seed starts with the smaller one
+        self._param_values = sobol.sample(self.problem,
+                                          _sample_size_,
+                                          calc_second_order=self._second_order,
+                                          seed=self._design_seed())
+
+        return self._sample_params()
+
+    def _design_seed(self):
+
+        import numpy as np
+
+        return int(np.random.SeedSequence(self.random_seed, spawn_key=(0, 0)).generate_state(1)[0])
+
+    def _load_design(self):
+
+        import numpy as np
+        from ..sampling import uniform_design
+
+        low, high = np.array(self.problem['bounds'], dtype=float).T
+
+        design = uniform_design(self._rounds, 'sobol', self._design_seed(), self.problem['num_vars'])
+        self._param_values = low + design * (high - low)
+
+        return self._sample_params()
+
+    def _sample_params(self):
+
+        self._params_ = [_round_params(self._params, self.problem['names'], values, self._fixed)
+                         for values in self._param_values]
 
         return 0
-                
+
+    def _load_checkpoint(self, path):
+
+        from ..checkpoint import load_checkpoint
+
+        state = load_checkpoint(path)
+
+        if (state['params'] != self._params
+                or state.get('surrogate', False) != self._surrogate
+                or state.get('second_order', False) != self._second_order):
+            raise ValueError("The checkpoint was made with different params or sampling")
+
+        # the seeded sample is drawn again and starts with the rounds done
+        self.random_seed = state['random_seed']
+        self.out = state['out']
+        self._daily = state.get('daily', [])
+
+        return self._load_params()
+
+    def _save_checkpoint(self):
+
+        from ..checkpoint import save_checkpoint
+
+        state = {'params': self._params,
+                 'surrogate': self._surrogate,
+                 'second_order': self._second_order,
+                 'random_seed': self.random_seed,
+                 'out': self.out,
+                 'daily': self._daily}
+
+        save_checkpoint(self._checkpoint_path, state)
+
     def _run(self):
-    
+
         import icusim
         from tqdm import tqdm
-        import pandas as pd
+        from .MonteCarlo import _round_seed
 
-        self.out = []
+        # a shard only runs its own rounds and keeps them from the start
+        for i in tqdm(range(self._first + len(self.out), self._stop),
+                      total=self._stop - self._first,
+                      initial=len(self.out)):
 
-        for i in tqdm(range(self._rounds)):
+            simulate_seed = _round_seed(self.random_seed, i)
 
-            results = icusim.simulate(self._params_[i])
-            df = icusim.stats_to_dataframe(results)
-            self.out.append(df.max().tolist())
+            results = icusim.simulate(self._params_[i], random_seed=simulate_seed, output='array')
+            self.out.append(results.max(axis=0).tolist())
+
+            if self._keep_daily:
+                self._daily.append(results)
+
+            if self._checkpoint_path is not None and len(self.out) % self._checkpoint_every == 0:
+                self._save_checkpoint()
+
+        if self._checkpoint_path is not None:
+            self._save_checkpoint()
 
         return 0
 
     def _dataframe(self):
-        
+
+        import numpy as np
         import pandas as pd
         import icusim
-    
+
         self.results = pd.DataFrame(self.out)
         self.results.columns = icusim.columns()
 
+        if self._keep_daily:
+            self.daily = np.array(self._daily)
+
         return 0
-        
-    def sensitivity(self, metric='standard_icu_total_demand'):
-        
-        '''Returns sensitivity analysis results for a given outcome.'''
-        
+
+    def sensitivity(self, metric='standard_icu_total_demand', second_order=False):
+
+        '''Returns sensitivity analysis results for a given outcome.
+
+        metric | str | one of icusim.columns()
+        second_order | bool | if True, returns the matrix of second-order
+                              indices instead, which needs the object to
+                              be created with second_order=True
+
+        '''
+
+        if second_order and not self._second_order:
+            raise ValueError("Second-order indices need SobolSensitivity(second_order=True)")
+
+        if self._surrogate:
+            return self._surrogate_sensitivity(metric, second_order)
+
         from SALib.analyze import sobol
         import pandas as pd
-        
+
         Si = sobol.analyze(self.problem,
                            self.results[metric].values,
-                           calc_second_order=False)
-        
-        _temp_ = {'first_order_sensitivity': Si['S1'], 'confidence': Si['S1_conf']}
+                           calc_second_order=self._second_order)
+
+        if second_order:
+            return pd.DataFrame(Si['S2'], index=self.problem['names'], columns=self.problem['names'])
+
+        _temp_ = {'first_order_sensitivity': Si['S1'],
+                  'confidence': Si['S1_conf'],
+                  'total_order_sensitivity': Si['ST'],
+                  'total_confidence': Si['ST_conf']}
         out = pd.DataFrame(_temp_, index=self.problem['names'])
-        
+
         return out
+
+    def sensitivity_table(self, daily=False, resamples=100, confidence=.95):
+
+        '''Returns first-order and total indices with confidence
+        intervals for every metric in one pass, as a tidy dataframe with
+        one row per metric and parameter.
+
+        daily | bool | if True, the indices are computed for every day
+                       separately and the frame gets a day column; needs
+                       the object to be created with keep_daily=True
+        resamples | int | number of bootstrap resamples
+        confidence | float | confidence level of the intervals
+
+        '''
+
+        import numpy as np
+        import pandas as pd
+        import icusim
+
+        metrics = list(icusim.columns())
+
+        if daily and not self._keep_daily:
+            raise ValueError("Daily indices need SobolSensitivity(keep_daily=True)")
+
+        # every output is one column, days first when daily
+        if daily:
+            rounds, days, _ = self.daily.shape
+            Y = self.daily.reshape(rounds, days * len(metrics))
+        else:
+            days = 1
+            Y = self.results[metrics].values
+
+        if self._surrogate:
+            first, first_confidence, total, total_confidence = self._surrogate_indices(Y, resamples, confidence)
+        else:
+            first, first_confidence, total, total_confidence = _saltelli_indices(Y,
+                                                                                 self.problem['num_vars'],
+                                                                                 self._second_order,
+                                                                                 resamples,
+                                                                                 confidence,
+                                                                                 self.random_seed)
+
+        names = self.problem['names']
+
+        out = {}
+
+        if daily:
+            out['day'] = np.repeat(np.arange(1, days + 1), len(metrics) * len(names))
+
+        out['metric'] = np.tile(np.repeat(metrics, len(names)), days)
+        out['parameter'] = np.tile(names, days * len(metrics))
+        out['first_order_sensitivity'] = first.T.ravel()
+        out['confidence'] = first_confidence.T.ravel()
+        out['total_order_sensitivity'] = total.T.ravel()
+        out['total_confidence'] = total_confidence.T.ravel()
+
+        return pd.DataFrame(out)
+
+    def _track_convergence(self):
+
+        import pandas as pd
+
+        out = self.sensitivity(self._convergence_metric)
+
+        _temp_ = pd.DataFrame({'rounds': len(self.results),
+                               'parameter': out.index,
+                               'first_order_sensitivity': out['first_order_sensitivity'].values,
+                               'total_order_sensitivity': out['total_order_sensitivity'].values})
+
+        # change of the indices since the previous extension
+        if self.convergence is None:
+            _temp_['first_order_change'] = float('nan')
+            _temp_['total_order_change'] = float('nan')
+            self.convergence = _temp_
+
+        else:
+            previous = self.convergence[self.convergence['rounds'] == self.convergence['rounds'].iloc[-1]]
+            _temp_['first_order_change'] = (_temp_['first_order_sensitivity'] - previous['first_order_sensitivity'].values).abs()
+            _temp_['total_order_change'] = (_temp_['total_order_sensitivity'] - previous['total_order_sensitivity'].values).abs()
+            self.convergence = pd.concat([self.convergence, _temp_], ignore_index=True)
+
+        return 0
+
+    def _surrogate_indices(self, Y, resamples, confidence):
+
+        model = self._surrogate_model(Y)
+        first, total = model.indices()
+        first_confidence, total_confidence = model.bootstrap(resamples, confidence, self.random_seed)
+
+        return first, first_confidence, total, total_confidence
+
+    def _surrogate_model(self, Y):
+
+        import numpy as np
+        from ..surrogate import PolynomialChaos
+
+        low, high = np.array(self.problem['bounds'], dtype=float).T
+        width = np.where(high > low, high - low, 1)
+
+        # the expansion is defined on inputs scaled to [-1, 1]
+        x = 2 * (self._param_values[:len(Y)] - low) / width - 1
+
+        return PolynomialChaos(self._surrogate_degree).fit(x, Y)
+
+    def _surrogate_sensitivity(self, metric, second_order=False):
+
+        import pandas as pd
+
+        model = self._surrogate_model(self.results[metric].values)
+        first, total = model.indices()
+        first_confidence, total_confidence = model.bootstrap(random_seed=self.random_seed)
+
+        self.validation[metric] = float(model.validation_score())
+
+        if second_order:
+            return pd.DataFrame(model.second_order_indices(), index=self.problem['names'], columns=self.problem['names'])
+
+        _temp_ = {'first_order_sensitivity': first,
+                  'confidence': first_confidence,
+                  'total_order_sensitivity': total,
+                  'total_confidence': total_confidence}
+
+        return pd.DataFrame(_temp_, index=self.problem['names'])
@@ -0,0 +1,41 @@
+from contextlib import contextmanager
+
+
+def workers(n_jobs):
+
+    '''Returns the number of worker processes for n_jobs, where None
+    or a value below 1 means all cores.'''
+
+    import os
+
+    if n_jobs is None or n_jobs < 1:
+        return os.cpu_count() or 1
+
+    return n_jobs
+
+
+def chunk_size(count, n_jobs):
+
+    '''Returns the number of items per task when count items are split
+    over n_jobs workers.'''
+
+    # a few chunks per worker keeps the workers busy till the end
+    return max(1, -(-count // (n_jobs * 4)))
+
+
+@contextmanager
+def task_map(n_jobs):
+
+    '''Yields a map(function, tasks) that returns the results in order,
+    running the tasks on a pool of n_jobs worker processes, or in this
+    process for a single job. The pool is kept open for every map
+    until the with block ends.'''
+
+    if n_jobs <= 1:
+        yield map
+        return
+
+    from multiprocessing import Pool
+
+    with Pool(n_jobs) as pool:
+        yield pool.imap
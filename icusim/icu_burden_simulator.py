@@ -1,11 +1,14 @@
 import collections
 import random
 import math
+import time
 from enum import Enum
 
 import simpy
 import numpy as np
 
+from .utils import _METRICS_
+
 
 class Hospital:
 
@@ -19,7 +22,8 @@ class Hospital:
                  daily_released_total,
                  daily_died_total,
                  statistic,
-                 icu_properties):
+                 icu_properties,
+                 profile=None):
 
         self.hospital_resource_manager = hospital_resource_manager
         self.departments = departments
@@ -31,6 +35,7 @@ class Hospital:
         self.daily_died_total = daily_died_total
         self.statistic = statistic
         self.icu_properties = icu_properties
+        self.profile = profile
 
 
 class ICU_Types(Enum):
@@ -38,47 +43,81 @@ class ICU_Types(Enum):
     ventilated_icu = 2
 
 
-class ICU(object):
+class ICUWard(object):
+    """Patients of one ICU department, stored as typed arrays of stay end
+    time and outcome that are kept sorted by the end time. Discharging
+    only touches the patients whose stay has ended."""
+
     def __init__(self,
-                 icu_type: ICU_Types,
-                 stay_duration: float,
-                 fatality_probability: float):
+                 icu_type: str,
+                 capacity: float):
         self.icu_type = icu_type
-        self.stay_duration = stay_duration
-        self.fatality_probability = fatality_probability
+        self.capacity = capacity
+        self.stay_duration = np.empty(0, dtype=np.float32)
+        self.patient_die = np.empty(0, dtype=bool)
+
+    def __len__(self):
+        return len(self.stay_duration)
+
+    def admit(self, stay_duration, patient_die):
+        order = np.argsort(stay_duration, kind='stable')
+        stay_duration = np.asarray(stay_duration, dtype=np.float32)[order]
+        position = np.searchsorted(self.stay_duration, stay_duration, side='right')
+        self.stay_duration = np.insert(self.stay_duration, position, stay_duration)
+        self.patient_die = np.insert(self.patient_die, position, np.asarray(patient_die, dtype=bool)[order])
+
+    def discharge(self, date_now):
+        """Removes the patients whose stay has ended by date_now and
+        returns the number of them that died and were released."""
+        ended = int(np.searchsorted(self.stay_duration, date_now, side='right'))
+        died = int(np.count_nonzero(self.patient_die[:ended]))
+        self.stay_duration = self.stay_duration[ended:]
+        self.patient_die = self.patient_die[ended:]
+        return died, ended - died
+
+
+def start_process(env, hospital, phase, generator):
+    """Starts a SimPy process. When profiling, the process is counted
+    and its run time is added to the given phase."""
+    if hospital.profile is not None:
+        from .profiling import profiled
+        hospital.profile.processes += 1
+        generator = profiled(generator, phase, hospital.profile)
+    return env.process(generator)
 
 
 def hospital_manager(env,
                      icu_type,
                      hospital,
-                     hours_in_day):
-    """A hospital_manager tries to place each patient while there exists free
-    space.
+                     hours_in_day,
+                     patient_count=1):
+    """A hospital_manager places the patients arriving in the same hour
+    while there exists free space and refuses the rest.
     """
 
     with hospital.hospital_resource_manager.request() as my_turn:
         # Wait until its our turn
         result = yield my_turn
 
-        capacity = hospital.departments_capacity[icu_type]['capacity']
-        new_cases = len(hospital.departments_capacity[icu_type]['icu_list'])
-        place_available = capacity - new_cases
+        icu_ward = hospital.departments_capacity[icu_type]
+        capacity = icu_ward.capacity
+        new_cases = len(icu_ward)
+        place_available = max(math.ceil(capacity - new_cases), 0)
 
-        # Check if it's our turn or if icu_type is filled in
-        if place_available <= 0:
-            hospital.daily_refused_total[icu_type] += 1
+        # Check how many fit before icu_type is filled in
+        accepted = min(patient_count, place_available)
+        hospital.daily_refused_total[icu_type] += patient_count - accepted
 
-        else:
-            # Hold a place
-            _a_ = [1] * int(hospital.icu_properties[icu_type]['fatality_rate'] * 100)
-            _b_ = [0] * int((1 - hospital.icu_properties[icu_type]['fatality_rate']) * 100)
-            dist = _a_ + _b_
-            patient_die = random.choice(dist)
-            out_time = abs(np.random.normal(env.now, hospital.icu_properties[icu_type]['stay_duration']))
-            icu = ICU(icu_type, out_time, patient_die)
+        if accepted > 0:
+            # Hold a place for each
+            fatality_rate = fatality_probability(hospital.icu_properties[icu_type]['fatality_rate'])
+            patient_die = np.random.random(accepted) < fatality_rate
+            out_time = np.abs(np.random.normal(env.now,
+                                               hospital.icu_properties[icu_type]['stay_duration'],
+                                               accepted))
 
-            hospital.daily_accepted_total[icu_type] += 1
-            hospital.departments_capacity[icu_type]['icu_list'].append(icu)
+            hospital.daily_accepted_total[icu_type] += accepted
+            icu_ward.admit(out_time, patient_die)
 
         yield env.exit()
 
@@ -91,7 +130,8 @@ def update_statistic(env,
     day_number = int(nearest_hour / hours_in_day)
     _a_ = nearest_hour != 0
     _b_ = nearest_hour % hours_in_day == 0
-    _c_ = day_number not in hospital.statistic
+    # days that are not recorded yet are -1
+    _c_ = day_number <= len(hospital.statistic) and hospital.statistic[day_number - 1, 0] < 0
     if _a_ and _b_ and _c_:
         standard_name = ICU_Types.standard_icu.name
         ventilated_name = ICU_Types.ventilated_icu.name
@@ -104,12 +144,8 @@ def update_statistic(env,
         _total_standard_died_ = hospital.daily_died_total[standard_name]
         total_died = {standard_name: _total_standard_died_, ventilated_name: _total_ventilated_died_}
 
-        hospital.statistic.update({day_number: {
-            'total_demand': total_demand,
-            'total_released': total_released,
-            'total_refused': total_refused,
-            'total_died': total_died
-        }})
+        metrics = [total_demand, total_released, total_refused, total_died]
+        hospital.statistic[day_number - 1] = [metric[icu_type] for metric in metrics for icu_type in hospital.departments]
 
         # cleanup count for the next day
         hospital.daily_died_total.update({icu_type: 0 for icu_type in hospital.departments})
@@ -130,34 +166,11 @@ def update_icu_departments(env,
     nearest_hour = round(env.now)
 
     if ((nearest_hour != 0) and (nearest_hour % update_frequency_in_hours == 0)):
-        standard_name = ICU_Types.standard_icu.name
-        ventilated_name = ICU_Types.ventilated_icu.name
-
-        # apply fatality probability to standard icu
-        standard_icu_list = hospital.departments_capacity[standard_name]['icu_list']
-        standard_icu_die_list = filter_icu_list_by_fatality_probability(standard_icu_list, env.now)
-        hospital.departments_capacity[standard_name]['icu_list'] = lists_diff(standard_icu_list, standard_icu_die_list)
-        total_died_standard_icu = len(standard_icu_list) - len(hospital.departments_capacity[standard_name]['icu_list'])
-        hospital.daily_died_total[standard_name] += total_died_standard_icu
-
-        # apply fatality probability to ventilated icu
-        ventilated_icu_list = hospital.departments_capacity[ventilated_name]['icu_list']
-        ventilated_icu_die_list = filter_icu_list_by_fatality_probability(ventilated_icu_list, env.now)
-        hospital.departments_capacity[ventilated_name]['icu_list'] = lists_diff(ventilated_icu_list, ventilated_icu_die_list)
-        total_died_ventilated_icu = len(ventilated_icu_list) - len(hospital.departments_capacity[ventilated_name]['icu_list'])
-        hospital.daily_died_total[ventilated_name] += total_died_ventilated_icu
-
-        # release standard icu
-        standard_icu_list = hospital.departments_capacity[standard_name]['icu_list']
-        hospital.departments_capacity[standard_name]['icu_list'] = filter_icu_list_by_stay_duration(standard_icu_list, env.now)
-        standard_icu_released_count = len(standard_icu_list) - len(hospital.departments_capacity[standard_name]['icu_list'])
-        hospital.daily_released_total[standard_name] += standard_icu_released_count
-
-        # release ventilated icu
-        ventilated_icu_list = hospital.departments_capacity[ventilated_name]['icu_list']
-        hospital.departments_capacity[ventilated_name]['icu_list'] = filter_icu_list_by_stay_duration(ventilated_icu_list, env.now)
-        ventilated_icu_released_count = len(ventilated_icu_list) - len(hospital.departments_capacity[ventilated_name]['icu_list'])
-        hospital.daily_released_total[ventilated_name] += ventilated_icu_released_count
+        # apply fatality probability and release at the end of stay
+        for icu_type in hospital.departments:
+            died, released = hospital.departments_capacity[icu_type].discharge(env.now)
+            hospital.daily_died_total[icu_type] += died
+            hospital.daily_released_total[icu_type] += released
 
     yield env.exit()
 
@@ -189,63 +202,51 @@ def patients_arrivals(env,
                                                                 int(total_ventilated_icu_population))
         standard_icu_name = hospital.departments[0]
         ventilated_icu_name = hospital.departments[1]
-        total_icu_arriving_distribution = list(
-            list(map(lambda ad: {
-                'icu_type': standard_icu_name,
-                'arriving_date': ad}, arriving_standard_icu_distribution))
-            +
-            list(map(lambda ad: {
-                'icu_type': ventilated_icu_name,
-                'arriving_date': ad}, arriving_ventilated_icu_distribution)))
+        hourly_arrivals = {
+            standard_icu_name: arrivals_by_hour(arriving_standard_icu_distribution, env.now, hours_in_day),
+            ventilated_icu_name: arrivals_by_hour(arriving_ventilated_icu_distribution, env.now, hours_in_day)}
+
+        if hospital.profile is not None:
+            hospital.profile.add_arrivals(get_nearest_day(env.now, hours_in_day),
+                                          len(arriving_standard_icu_distribution) + len(arriving_ventilated_icu_distribution))
 
         for hour in range(1, 25):
-            filtered_icu_entities = list(filter(
-                lambda icu_entity: (env.now <= icu_entity['arriving_date'] <= env.now + update_timeout),
-                total_icu_arriving_distribution))
+            for icu_type in hospital.departments:
+                patient_count = int(hourly_arrivals[icu_type][hour - 1])
 
-            for icu_entity in filtered_icu_entities:
-                env.process(hospital_manager(env,
-                                             icu_entity['icu_type'],
-                                             hospital,
-                                             hours_in_day))
+                if patient_count > 0:
+                    start_process(env, hospital, 'hospital_manager', hospital_manager(env,
+                                                                                      icu_type,
+                                                                                      hospital,
+                                                                                      hours_in_day,
+                                                                                      patient_count))
 
             if env.now != 0 and hour % hours_in_day == 0:
-                env.process(update_icu_departments(env,
-                                                   hospital,
-                                                   update_frequency_in_hours))
-                env.process(update_statistic(env,
-                                             hospital,
-                                             hours_in_day))
+                start_process(env, hospital, 'update_icu_departments', update_icu_departments(env,
+                                                                                              hospital,
+                                                                                              update_frequency_in_hours))
+                start_process(env, hospital, 'update_statistic', update_statistic(env,
+                                                                                  hospital,
+                                                                                  hours_in_day))
 
             yield env.timeout(update_timeout)
 
 
-def filter_icu_list_by_fatality_probability(icu_list, date_now):
-    return list(
-        filter(
-            lambda icu: icu.stay_duration <= date_now and icu.fatality_probability,
-            icu_list))
-
-
-def filter_icu_list_by_stay_duration(icu_list, date_now):
-    return list(
-        filter(
-            lambda icu: icu.stay_duration > date_now,
-            icu_list))
+def arrivals_by_hour(arriving_distribution, day_start, hours_in_day):
+    """Counts the arrivals that fall into each hour of the day starting
+    at day_start. Arrivals outside of the day are dropped."""
+    hours = day_start + np.arange(hours_in_day + 1)
+    return np.histogram(arriving_distribution, bins=hours)[0]
 
 
 def is_there_difference_between_max_and_current(departments_capacity):
-    return departments_capacity['capacity'] - len(departments_capacity['icu_list'])
+    return departments_capacity.capacity - len(departments_capacity)
 
 
 def get_nearest_day(time_now, hours_in_day):
     return math.ceil(time_now / hours_in_day)
 
 
-def lists_diff(first, second):
-    return [item for item in first if item not in set(second)]
-
-
 def get_population_by_day(time_now,
                           hours_in_day,
                           patients_amount,
@@ -253,18 +254,27 @@ def get_population_by_day(time_now,
     return (((get_nearest_day(time_now, hours_in_day)/doubles_in_days) * patients_amount) + patients_amount)
 
 
+def fatality_probability(fatality_rate: float) -> float:
+    """Probability of death implied by the 100-element draw that
+    hospital_manager makes for each admitted patient."""
+    died = max(int(fatality_rate * 100), 0)
+    survived = max(int((1 - fatality_rate) * 100), 0)
+    return died / (died + survived)
+
+
 def get_daily_incoming_rate(hours_in_day, population) -> float:
     return hours_in_day / population
 
 
-def generate_random_icu_list(icu_count: int,
+def generate_random_icu_ward(icu_count: int,
                              icu_stay_duration: int,
                              icu_type: str,
-                             hours_in_day: int) -> list:
-    return list(
-        map(
-            lambda stay_duration: ICU(icu_type, round(stay_duration), np.random.choice(2, 1)[0]),
-            np.random.normal(icu_stay_duration, hours_in_day*2, icu_count)))
+                             capacity: float,
+                             hours_in_day: int) -> ICUWard:
+    icu_ward = ICUWard(icu_type, capacity)
+    icu_ward.admit(np.round(np.random.normal(icu_stay_duration, hours_in_day*2, icu_count)),
+                   np.random.randint(0, 2, icu_count))
+    return icu_ward
 
 
 def simulate(p: dict = {
@@ -278,7 +288,158 @@ def simulate(p: dict = {
              'ventilated_cfr': 0.8,
              'standard_duration': 10,
              'ventilated_duration': 10},
-             random_seed=None):
+             random_seed=None,
+             engine='simpy',
+             cache=None,
+             output='dict',
+             profile=None,
+             stop_when=None):
+
+    '''Runs a single simulation and returns daily statistics in
+    the form {day: {metric: {icu_type: value}}}.
+
+    p | dict | input parameters, for example from icusim.params()
+    random_seed | int | seed for reproducible results
+    engine | str | 'simpy' for the event driven reference engine,
+                   'numpy' for the vectorized engine or 'cohort' for
+                   the engine that tracks counts instead of patients
+    cache | str or ResultCache | directory of an on-disk cache for
+                                 seeded runs
+    output | str | 'dict' for the form above or 'array' for a (day,
+                   metric) array where the metrics follow icusim.columns()
+    profile | bool or callable | if True, returns (statistics, Profile)
+                                 with the time per simulation phase and
+                                 event, process, ward size and arrival
+                                 counters; if a function, it is called
+                                 with the Profile instead. Only for the
+                                 simpy engine, and bypasses the cache
+    stop_when | callable | called after every day with the (day, metric)
+                           array of the days so far; the run ends as soon
+                           as it returns True. The days that were not
+                           simulated are NaN with output='array' and left
+                           out with output='dict'. Bypasses the cache
+
+    '''
+
+    from .numpy_simulator import statistic_to_dict
+
+    if engine not in ('simpy', 'numpy', 'cohort'):
+        raise ValueError("engine must be 'simpy', 'numpy' or 'cohort'")
+
+    if output not in ('dict', 'array'):
+        raise ValueError("output must be 'dict' or 'array'")
+
+    _check_starting_count(p)
+
+    if stop_when is not None:
+
+        if profile is not None and profile is not False:
+            raise ValueError("profile and stop_when cannot be combined")
+
+        statistic = np.full((p['days_to_simulate'], len(_METRICS_) * 2), np.nan)
+
+        for day, values in enumerate(_iter_engine(p, random_seed, engine)):
+            statistic[day] = values
+
+            if stop_when(statistic[:day + 1]):
+                break
+
+        if output == 'array':
+            return statistic
+
+        return statistic_to_dict(statistic[~np.isnan(statistic[:, 0])].astype(int))
+
+    if profile is not None and profile is not False:
+        from .profiling import Profile
+
+        if engine != 'simpy':
+            raise ValueError("profile is only available for the 'simpy' engine")
+
+        counters = Profile()
+        statistic = simulate_simpy(p, random_seed, counters)
+
+        if output == 'dict':
+            statistic = statistic_to_dict(statistic)
+
+        if callable(profile):
+            profile(counters)
+            return statistic
+
+        return statistic, counters
+
+    # unseeded runs are meant to differ, so only seeded runs are cached
+    if cache is not None and random_seed is not None:
+        from .cache import ResultCache
+
+        if not isinstance(cache, ResultCache):
+            cache = ResultCache(cache)
+
+        key = cache.key(p, random_seed, engine)
+        statistic = cache.get(key)
+
+        if statistic is None:
+            statistic = _simulate_engine(p, random_seed, engine)
+            cache.put(key, statistic)
+
+    else:
+        statistic = _simulate_engine(p, random_seed, engine)
+
+    if output == 'array':
+        return statistic
+
+    return statistic_to_dict(statistic)
+
+
+def simulate_iter(p, random_seed=None, engine='simpy'):
+
+    '''Runs a single simulation day by day and yields the (metric,)
+    array of each day as soon as it is recorded, where the metrics
+    follow icusim.columns(). The days after the iteration is stopped
+    are never simulated.
+
+    p | dict | input parameters, for example from icusim.params()
+    random_seed | int | seed for reproducible results; the days are
+                        the same as those of simulate()
+    engine | str | 'simpy', 'numpy' or 'cohort'
+
+    '''
+
+    if engine not in ('simpy', 'numpy', 'cohort'):
+        raise ValueError("engine must be 'simpy', 'numpy' or 'cohort'")
+
+    _check_starting_count(p)
+
+    return _iter_engine(p, random_seed, engine)
+
+
+def exceeds(metric, threshold, cumulative=False):
+
+    '''Returns a stop_when predicate for simulate() and MonteCarlo that
+    is True once metric is above threshold on a day, or with cumulative
+    True once its sum over the days so far is. Unlike a lambda, it can
+    be sent to worker processes.
+
+    metric | str | one of icusim.columns()
+    threshold | float | value to exceed
+    cumulative | bool | compare the running total instead of the day
+
+    '''
+
+    from functools import partial
+    from .utils import columns
+
+    return partial(_exceeds, list(columns()).index(metric), threshold, cumulative)
+
+
+def _exceeds(index, threshold, cumulative, statistic):
+
+    if cumulative:
+        return statistic[:, index].sum() > threshold
+
+    return statistic[-1, index] > threshold
+
+
+def _check_starting_count(p):
 
     starting_standard_icu_count = int(p['initial_patient_count'] * (1 - p['ventilation_rate']))
     starting_ventilated_icu_count = int(p['initial_patient_count'] * p['ventilation_rate'])
@@ -289,37 +450,141 @@ def simulate(p: dict = {
     if (_a_ or _b_):
         raise Exception("Starting amount can't be bigger then capacity!")
 
+
+def _iter_engine(p, random_seed, engine):
+
+    if engine == 'numpy':
+        from .numpy_simulator import iter_numpy
+        yield from iter_numpy(p, random_seed)
+
+    elif engine == 'cohort':
+        from .cohort_simulator import iter_cohort
+        yield from iter_cohort(p, random_seed)
+
+    else:
+        env, hospital = _start_simpy(p, random_seed)
+
+        # the daily statistic is recorded just before the end of each day
+        for day in range(p['days_to_simulate']):
+            env.run(until=(day + 1) * 24)
+            yield hospital.statistic[day].copy()
+
+
+def _simulate_engine(p, random_seed, engine):
+
+    if engine == 'numpy':
+        from .numpy_simulator import simulate_numpy
+        return simulate_numpy(p, random_seed)
+
+    if engine == 'cohort':
+        from .cohort_simulator import simulate_cohort
+        return simulate_cohort(p, random_seed)
+
+    return simulate_simpy(p, random_seed)
+
+
+def simulate_simpy(p, random_seed=None, profile=None):
+
+    '''Event driven reference engine behind simulate(). Returns a
+    (day, metric) array. If a Profile is given, its counters are
+    filled during the run.'''
+
+    hours_to_simulate = p['days_to_simulate'] * 24
+
+    env, hospital = _start_simpy(p, random_seed, profile)
+
+    if profile is None:
+        env.run(until=hours_to_simulate)
+
+        return hospital.statistic
+
+    step = env.step
+
+    # counts events and follows the ward sizes at every step
+    def _profiled_step_():
+        step()
+        profile.events += 1
+        for icu_type in hospital.departments:
+            profile.peak_ward_size[icu_type] = max(profile.peak_ward_size.get(icu_type, 0),
+                                                   len(hospital.departments_capacity[icu_type]))
+
+    env.step = _profiled_step_
+
+    start = time.perf_counter()
+    env.run(until=hours_to_simulate)
+    profile.seconds += time.perf_counter() - start
+    profile.rounds += 1
+
+    return hospital.statistic
+
+
+def _start_simpy(p, random_seed=None, profile=None, snapshot=None):
+
+    '''Sets up the SimPy environment and hospital for p and starts the
+    patient arrivals. With a Snapshot, the wards, counters, statistic
+    and random state continue from the end of its day, unless
+    random_seed is given for a new random stream.'''
+
     hours_in_day = 24
     update_frequency_in_hours = 1
 
-    hours_to_simulate = p['days_to_simulate'] * hours_in_day
     standard_icu_stay_duration = p['standard_duration'] * hours_in_day
     ventilated_icu_stay_duration = p['ventilated_duration'] * hours_in_day
 
-    if random_seed is not None:
-        random.seed(random_seed)
-
-    # init stuff
-    env = simpy.Environment()
-    hospital_resource_manager = simpy.Resource(env, capacity=1)
-    statistic = {}
     departments = [ICU_Types.standard_icu.name, ICU_Types.ventilated_icu.name]
+    capacity = {ICU_Types.standard_icu.name: p['standard_capacity'],
+                ICU_Types.ventilated_icu.name: p['ventilated_capacity']}
+    statistic = np.full((p['days_to_simulate'], len(_METRICS_) * len(departments)), -1, dtype=int)
+
+    if snapshot is None:
+        starting_standard_icu_count = int(p['initial_patient_count'] * (1 - p['ventilation_rate']))
+        starting_ventilated_icu_count = int(p['initial_patient_count'] * p['ventilation_rate'])
+
+        if random_seed is not None:
+            random.seed(random_seed)
+            np.random.seed(random_seed)
+
+        # init stuff
+        env = simpy.Environment()
+
+        _temp_standard_icu_ward_ = generate_random_icu_ward(starting_standard_icu_count,
+                                                            p['standard_duration'],
+                                                            ICU_Types.standard_icu.name,
+                                                            p['standard_capacity'],
+                                                            hours_in_day)
+
+        _temp_ventilated_icu_ward_ = generate_random_icu_ward(starting_ventilated_icu_count,
+                                                              p['ventilated_duration'],
+                                                              ICU_Types.ventilated_icu.name,
+                                                              p['ventilated_capacity'],
+                                                              hours_in_day)
+
+        departments_capacity = {ICU_Types.standard_icu.name: _temp_standard_icu_ward_,
+                                ICU_Types.ventilated_icu.name: _temp_ventilated_icu_ward_}
+
+        counters = {name: {icu_type: 0 for icu_type in departments}
+                    for name in ('refused', 'accepted', 'released', 'died')}
+
+    else:
+        if random_seed is not None:
+            random.seed(random_seed)
+            np.random.seed(random_seed)
+        else:
+            random.setstate(snapshot.random_state)
+            np.random.set_state(snapshot.numpy_state)
 
-    _temp_standard_icu_list_ = generate_random_icu_list(starting_standard_icu_count,
-                                                        p['standard_duration'],
-                                                        ICU_Types.standard_icu.name,
-                                                        hours_in_day)
+        # the clock continues from the end of the snapshot day
+        env = simpy.Environment(initial_time=snapshot.day * hours_in_day)
+        statistic[:snapshot.day] = snapshot.statistic
 
-    _temp_ventilated_icu_list_ = generate_random_icu_list(starting_ventilated_icu_count,
-                                                          p['ventilated_duration'],
-                                                          ICU_Types.ventilated_icu.name,
-                                                          hours_in_day)
+        departments_capacity = {}
 
-    _temp_standard_icu_dict_ = {'capacity': p['standard_capacity'], 'icu_list': _temp_standard_icu_list_}
-    _temp_ventilated_icu_dict_ = {'capacity': p['ventilated_capacity'], 'icu_list': _temp_ventilated_icu_list_}
+        for icu_type in departments:
+            departments_capacity[icu_type] = ICUWard(icu_type, capacity[icu_type])
+            departments_capacity[icu_type].stay_duration = snapshot.wards[icu_type][0].copy()
+            departments_capacity[icu_type].patient_die = snapshot.wards[icu_type][1].copy()
 
-    departments_capacity = {ICU_Types.standard_icu.name: _temp_standard_icu_dict_,
-                            ICU_Types.ventilated_icu.name: _temp_ventilated_icu_dict_}
+        counters = {name: dict(values) for name, values in snapshot.counters.items()}
 
     _temp_standard_icu_meta_ = {'fatality_rate': p['standard_cfr'],
                                 'stay_duration': standard_icu_stay_duration}
@@ -330,21 +595,17 @@ def simulate(p: dict = {
     icu_properties = {ICU_Types.standard_icu.name: _temp_standard_icu_meta_,
                       ICU_Types.ventilated_icu.name: _temp_ventilated_icu_meta_}
 
-    daily_released_total = {icu_type: 0 for icu_type in departments}
-    daily_refused_total = {icu_type: 0 for icu_type in departments}
-    daily_accepted_total = {icu_type: 0 for icu_type in departments}
-    daily_died_total = {icu_type: 0 for icu_type in departments}
-
-    hospital = Hospital(hospital_resource_manager,
+    hospital = Hospital(simpy.Resource(env, capacity=1),
                         departments,
                         departments_capacity,
                         p['ventilation_rate'],
-                        daily_refused_total,
-                        daily_accepted_total,
-                        daily_released_total,
-                        daily_died_total,
+                        counters['refused'],
+                        counters['accepted'],
+                        counters['released'],
+                        counters['died'],
                         statistic,
-                        icu_properties)
+                        icu_properties,
+                        profile)
 
     # start simulation
     _temp_patients_arrival_ = patients_arrivals(env,
@@ -354,7 +615,6 @@ def simulate(p: dict = {
                                                 p['doubles_in_days'],
                                                 update_frequency_in_hours)
 
-    env.process(_temp_patients_arrival_)
-    env.run(until=hours_to_simulate)
+    start_process(env, hospital, 'patients_arrivals', _temp_patients_arrival_)
 
-    return hospital.statistic
+    return env, hospital
@@ -0,0 +1,332 @@
+import math
+
+import numpy as np
+
+from .icu_burden_simulator import ICU_Types, get_population_by_day
+from .utils import _METRICS_
+
+_PARAMETERS_ = ['initial_patient_count',
+                'ventilation_rate',
+                'days_to_simulate',
+                'doubles_in_days',
+                'standard_capacity',
+                'ventilated_capacity',
+                'standard_cfr',
+                'ventilated_cfr',
+                'standard_duration',
+                'ventilated_duration']
+
+
+def hourly_arrival_probabilities(hours_in_day, mu=13, sigma=4):
+    """Probability that a patient arriving at N(day start + mu, sigma)
+    falls into each hour of the day. The last element is the share of
+    patients that land outside of the day and never arrive."""
+
+    edges = np.arange(hours_in_day + 1)
+    cdf = np.array([0.5 * (1 + math.erf((edge - mu) / (sigma * math.sqrt(2)))) for edge in edges])
+    hourly = np.diff(cdf)
+
+    return np.append(hourly, max(1 - hourly.sum(), 0))
+
+
+def fatality_probabilities(fatality_rate):
+    """Vectorized fatality_probability() for an array of rates."""
+
+    fatality_rate = np.asarray(fatality_rate, dtype=float)
+    died = np.maximum(np.trunc(fatality_rate * 100), 0)
+    survived = np.maximum(np.trunc((1 - fatality_rate) * 100), 0)
+
+    return died / (died + survived)
+
+
+def admit(capacity, occupied, arriving):
+    """Returns the number of patients admitted per scenario and hour
+    when the hourly arrivals (scenario, hour) queue for the free places
+    in a ward."""
+
+    place_available = np.maximum(np.ceil(capacity) - occupied, 0)
+    accepted = np.minimum(np.cumsum(arriving, axis=1), place_available[:, None])
+
+    return np.diff(accepted, axis=1, prepend=0).astype(int)
+
+
+def _as_columns(param_table):
+
+    # a list of params() dicts is turned into columns first
+    if isinstance(param_table, (list, tuple)):
+        param_table = {key: [p[key] for p in param_table] for key in _PARAMETERS_}
+
+    return {key: np.atleast_1d(np.asarray(param_table[key])) for key in _PARAMETERS_}
+
+
+class _Ward:
+
+    '''Admitted patients of one ICU type across all scenarios, kept as
+    flat arrays of scenario index, stay end time and outcome.'''
+
+    def __init__(self, scenarios, capacity, stay_duration, fatality):
+
+        self.scenarios = scenarios
+        self.capacity = capacity
+        self.stay_duration = stay_duration
+        self.fatality = fatality
+
+        self.scenario = np.empty(0, dtype=int)
+        self.out_time = np.empty(0)
+        self.patient_die = np.empty(0, dtype=bool)
+
+    def occupied(self):
+
+        return np.bincount(self.scenario, minlength=self.scenarios)
+
+    def add(self, scenario, out_time, patient_die):
+
+        self.scenario = np.concatenate([self.scenario, scenario])
+        self.out_time = np.concatenate([self.out_time, out_time])
+        self.patient_die = np.concatenate([self.patient_die, patient_die])
+
+    def start(self, rng, count, duration, scale):
+
+        '''Places the starting patients, count per scenario, following
+        generate_random_icu_ward().'''
+
+        scenario = np.repeat(np.arange(self.scenarios), count)
+        out_time = np.round(rng.normal(duration[scenario], scale))
+        patient_die = rng.integers(0, 2, len(scenario)).astype(bool)
+
+        self.add(scenario, out_time, patient_die)
+
+    def accept(self, rng, arriving, hours):
+
+        '''Places hourly arrivals and returns accepted and refused counts
+        per scenario.'''
+
+        accepted = admit(self.capacity, self.occupied(), arriving)
+        hours_count = accepted.shape[1]
+
+        scenario = np.repeat(np.repeat(np.arange(self.scenarios), hours_count), accepted.ravel())
+        arriving_time = np.repeat(np.tile(hours, self.scenarios), accepted.ravel())
+
+        out_time = np.abs(rng.normal(arriving_time, self.stay_duration[scenario]))
+        patient_die = rng.random(len(scenario)) < self.fatality[scenario]
+
+        self.add(scenario, out_time, patient_die)
+
+        total_accepted = accepted.sum(axis=1)
+
+        return total_accepted, arriving.sum(axis=1) - total_accepted
+
+    def discharge(self, rng, date_now):
+
+        '''Removes patients whose stay has ended and returns died and
+        released counts per scenario.'''
+
+        ended = self.out_time <= date_now
+
+        died = np.bincount(self.scenario[ended & self.patient_die], minlength=self.scenarios)
+        ended_count = np.bincount(self.scenario[ended], minlength=self.scenarios)
+
+        self.scenario = self.scenario[~ended]
+        self.out_time = self.out_time[~ended]
+        self.patient_die = self.patient_die[~ended]
+
+        return died, ended_count - died
+
+
+def simulate_batch(param_table, random_seed=None):
+
+    '''Runs many simulations at once, advancing all scenarios together
+    with the scenario as an array axis. Returns an array with shape
+    (scenario, day, metric) where the metrics follow icusim.columns().
+
+    param_table | DataFrame, dict or list | one row per scenario with the
+                  keys produced by icusim.params()
+    random_seed | int | seed for reproducible results
+
+    '''
+
+    columns = _as_columns(param_table)
+    statistic = _new_statistic(columns)
+
+    for day in _batch_days(columns, random_seed, statistic):
+        pass
+
+    return statistic
+
+
+def iter_numpy(p, random_seed=None):
+
+    '''Runs simulate_numpy() day by day and yields the (metric,) array
+    of each day as soon as it is simulated.'''
+
+    columns = _as_columns([p])
+    statistic = _new_statistic(columns)
+
+    for day in _batch_days(columns, random_seed, statistic):
+        yield statistic[0, day].copy()
+
+
+def _new_statistic(columns):
+
+    '''Checks the scenarios and returns a zeroed (scenario, day, metric)
+    array for their results.'''
+
+    days_to_simulate = np.unique(columns['days_to_simulate'])
+
+    if len(days_to_simulate) != 1:
+        raise ValueError("All scenarios must have the same days_to_simulate")
+
+    days_to_simulate = int(days_to_simulate[0])
+    scenarios = len(columns['days_to_simulate'])
+
+    starting_standard_icu_count = (columns['initial_patient_count'] * (1 - columns['ventilation_rate'])).astype(int)
+    starting_ventilated_icu_count = (columns['initial_patient_count'] * columns['ventilation_rate']).astype(int)
+
+    _a_ = np.any(starting_standard_icu_count > columns['standard_capacity'])
+    _b_ = np.any(starting_ventilated_icu_count > columns['ventilated_capacity'])
+
+    if (_a_ or _b_):
+        raise Exception("Starting amount can't be bigger then capacity!")
+
+    return np.zeros((scenarios, days_to_simulate, len(_METRICS_) * 2), dtype=int)
+
+
+def _batch_days(columns, random_seed, statistic, ward=_Ward):
+
+    '''Advances all scenarios one day at a time, writing the results
+    into statistic and yielding the index of each finished day. ward
+    is the class that holds the patients of one ICU type, _Ward or
+    the _Cohorts of the cohort engine.'''
+
+    scenarios, days_to_simulate, _ = statistic.shape
+
+    starting_standard_icu_count = (columns['initial_patient_count'] * (1 - columns['ventilation_rate'])).astype(int)
+    starting_ventilated_icu_count = (columns['initial_patient_count'] * columns['ventilation_rate']).astype(int)
+
+    rng = np.random.default_rng(random_seed)
+
+    hours_in_day = 24
+    arrival_probabilities = hourly_arrival_probabilities(hours_in_day)
+
+    standard_name = ICU_Types.standard_icu.name
+    ventilated_name = ICU_Types.ventilated_icu.name
+    departments = [standard_name, ventilated_name]
+
+    wards = {
+        standard_name: ward(scenarios,
+                            columns['standard_capacity'],
+                            columns['standard_duration'] * hours_in_day,
+                            fatality_probabilities(columns['standard_cfr'])),
+        ventilated_name: ward(scenarios,
+                              columns['ventilated_capacity'],
+                              columns['ventilated_duration'] * hours_in_day,
+                              fatality_probabilities(columns['ventilated_cfr']))}
+
+    # starting patients follow generate_random_icu_ward()
+    starting_count = {standard_name: starting_standard_icu_count,
+                      ventilated_name: starting_ventilated_icu_count}
+    starting_duration = {standard_name: columns['standard_duration'],
+                         ventilated_name: columns['ventilated_duration']}
+
+    for icu_type in departments:
+        wards[icu_type].start(rng, starting_count[icu_type], starting_duration[icu_type], hours_in_day * 2)
+
+    daily_refused_total = {icu_type: np.zeros(scenarios, dtype=int) for icu_type in departments}
+    daily_accepted_total = {icu_type: np.zeros(scenarios, dtype=int) for icu_type in departments}
+    daily_released_total = {icu_type: np.zeros(scenarios, dtype=int) for icu_type in departments}
+    daily_died_total = {icu_type: np.zeros(scenarios, dtype=int) for icu_type in departments}
+
+    def accept(icu_type, arriving, hours):
+
+        accepted, refused = wards[icu_type].accept(rng, arriving, hours)
+        daily_accepted_total[icu_type] += accepted
+        daily_refused_total[icu_type] += refused
+
+    for day in range(days_to_simulate):
+
+        day_start = day * hours_in_day
+
+        total_population = get_population_by_day(day_start,
+                                                 hours_in_day,
+                                                 columns['initial_patient_count'],
+                                                 columns['doubles_in_days'])
+        require_ventilation_rate = columns['ventilation_rate'] + rng.normal(0, 0.01, scenarios)
+        arriving_count = {standard_name: np.round(total_population * (1 - require_ventilation_rate)),
+                          ventilated_name: np.round(total_population * require_ventilation_rate)}
+
+        arriving = {icu_type: rng.multinomial(arriving_count[icu_type].astype(int),
+                                              arrival_probabilities)[:, :hours_in_day]
+                    for icu_type in departments}
+
+        hours = day_start + np.arange(hours_in_day)
+
+        # the first 23 hours of arrivals are placed before the daily update
+        for icu_type in departments:
+            accept(icu_type, arriving[icu_type][:, :-1], hours[:-1])
+
+        # apply fatality probability and release at the end of stay
+        for icu_type in departments:
+            died, released = wards[icu_type].discharge(rng, hours[-1])
+            daily_died_total[icu_type] += died
+            daily_released_total[icu_type] += released
+
+        total_died_refused_ventilated_icu = daily_refused_total[ventilated_name]
+
+        total_demand = {icu_type: daily_refused_total[icu_type] + daily_accepted_total[icu_type] for icu_type in departments}
+        total_died = {standard_name: daily_died_total[standard_name],
+                      ventilated_name: daily_died_total[ventilated_name] + total_died_refused_ventilated_icu}
+
+        metrics = [total_demand, daily_released_total, daily_refused_total, total_died]
+
+        for i, metric in enumerate(metrics):
+            for ii, icu_type in enumerate(departments):
+                statistic[:, day, i * len(departments) + ii] = metric[icu_type]
+
+        # cleanup count for the next day
+        for counter in [daily_refused_total, daily_accepted_total, daily_released_total, daily_died_total]:
+            for icu_type in departments:
+                counter[icu_type][:] = 0
+
+        # the last hour of arrivals is placed after the daily update
+        for icu_type in departments:
+            accept(icu_type, arriving[icu_type][:, -1:], hours[-1:])
+
+        yield day
+
+
+def statistic_to_dict(statistic):
+
+    """Converts a (day, metric) array into the {day: {metric: {icu_type:
+    value}}} form returned by simulate()."""
+
+    departments = [ICU_Types.standard_icu.name, ICU_Types.ventilated_icu.name]
+    out = {}
+
+    for day in range(len(statistic)):
+        out[day + 1] = {metric: {icu_type: int(statistic[day, i * len(departments) + ii])
+                                 for ii, icu_type in enumerate(departments)}
+                        for i, metric in enumerate(_METRICS_)}
+
+    return out
+
+
+def statistic_to_array(statistic):
+
+    """Converts the {day: {metric: {icu_type: value}}} form returned by
+    simulate() into a (day, metric) array."""
+
+    departments = [ICU_Types.standard_icu.name, ICU_Types.ventilated_icu.name]
+
+    return np.array([[statistic[day][metric][icu_type] for metric in _METRICS_ for icu_type in departments]
+                     for day in sorted(statistic)], dtype=int).reshape(len(statistic), len(_METRICS_) * len(departments))
+
+
+def simulate_numpy(p, random_seed=None):
+
+    '''Vectorized counterpart of simulate(). Arrivals are drawn as
+    hourly counts, each ward is kept as arrays of stay end times and
+    outcomes, and deaths and releases are applied with masks. The
+    output has the same distribution as the SimPy engine, as a (day,
+    metric) array.'''
+
+    return simulate_batch([p], random_seed)[0]
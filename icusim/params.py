@@ -16,7 +16,8 @@ def params(initial_patient_count=120,
            doubles_in_days_max=12.0,
            ventilation_rate_min=.3,
            ventilation_rate_max=.8,
-           show_params=False):
+           show_params=False,
+           u=None):
     
     '''
     Creates input parameters for simulate().
@@ -45,6 +46,10 @@ def params(initial_patient_count=120,
     ventilation_rate_min | float | minimum rate at which ventilation is required
     ventilation_rate_max | float | maximum rate at which ventilation is required
     show_params | bool | prints out the parameters if True
+    u | array | optional 8 uniform numbers in [0, 1) that pick the value
+                of each randomized input in the order below, instead of
+                random.choice(); used for common random numbers and
+                stratified sampling designs
     
     
     '''
@@ -52,33 +57,38 @@ def params(initial_patient_count=120,
     import random
     import numpy as np
     
+    def _choice_(i, grid):
+        if u is None:
+            return random.choice(grid)
+        return grid[min(int(u[i] * len(grid)), len(grid) - 1)]
+    
     # change scale for stronger random effect (only applies to normally distributed)
     _random_normal_ = np.random.normal(loc=1, scale=0.01)
     
     # set max capacity 
-    _capacity_ = random.choice(range(total_capacity_min, total_capacity_max, 50))
+    _capacity_ = _choice_(0, range(total_capacity_min, total_capacity_max, 50))
     
     # set the fraction of ventilation capacity
-    _ventilated_capacity_ = random.choice(np.arange(ventilated_icu_share_min, ventilated_icu_share_max, step=.01))
+    _ventilated_capacity_ = _choice_(1, np.arange(ventilated_icu_share_min, ventilated_icu_share_max, step=.01))
     
     # set standard case fatality rate
-    _fatality_rate_ = random.choice(np.arange(standard_cfr_min, standard_cfr_max, step=.01))
+    _fatality_rate_ = _choice_(2, np.arange(standard_cfr_min, standard_cfr_max, step=.01))
     
     # set ventilated case fatality rate
-    _ventilated_fatality_factor_ = random.choice(np.arange(ventilated_cfr_min, ventilated_cfr_max, step=0.01))
+    _ventilated_fatality_factor_ = _choice_(3, np.arange(ventilated_cfr_min, ventilated_cfr_max, step=0.01))
     
     # set the mean duration of standard ICU stay (ventilated is based on it
-    _standard_icu_stay_duration_ = random.choice(np.arange(standard_duration_min, standard_duration_max, step=0.1))
+    _standard_icu_stay_duration_ = _choice_(4, np.arange(standard_duration_min, standard_duration_max, step=0.1))
                        
     # set a multiplier for ventilated stay duration
     _temp_ = np.arange(ventilated_duration_factor_min, ventilated_duration_factor_max, step=0.01)                   
-    _ventilated_duration_factor_ = random.choice(_temp_)
+    _ventilated_duration_factor_ = _choice_(5, _temp_)
     
     # set the number of days during which doubling of cases happens
-    _doubles_in_days_ = random.choice(np.arange(doubles_in_days_min, doubles_in_days_max, step=.1))
+    _doubles_in_days_ = _choice_(6, np.arange(doubles_in_days_min, doubles_in_days_max, step=.1))
     
     # set the percent of patients that require ventilation
-    _require_ventilation_rate_ = random.choice(np.arange(ventilation_rate_min, ventilation_rate_max, step=.01))
+    _require_ventilation_rate_ = _choice_(7, np.arange(ventilation_rate_min, ventilation_rate_max, step=.01))
    
     # review the logic here
     doubles_in_days = _doubles_in_days_
@@ -108,3 +118,94 @@ def params(initial_patient_count=120,
             print(key, p[key])
     
     return p
+
+
+def params_batch(n,
+                 initial_patient_count=120,
+                 days_to_simulate=50,
+                 total_capacity_min=200,
+                 total_capacity_max=1000,
+                 ventilated_icu_share_min=.4,
+                 ventilated_icu_share_max=.7,
+                 standard_cfr_min=.2,
+                 standard_cfr_max=.6,
+                 ventilated_cfr_min=1.3,
+                 ventilated_cfr_max=1.7,
+                 standard_duration_min=8,
+                 standard_duration_max=25,
+                 ventilated_duration_factor_min=1,
+                 ventilated_duration_factor_max=1.2,
+                 doubles_in_days_min=2.0,
+                 doubles_in_days_max=12.0,
+                 ventilation_rate_min=.3,
+                 ventilation_rate_max=.8,
+                 random_seed=None,
+                 u=None):
+    
+    '''
+    Creates n sets of input parameters at once, with the same
+    distributions and derived fields as params().
+    
+    Takes the same ranges as params(), and in addition:
+    
+    n | int | number of parameter sets
+    random_seed | int | seed for the draws
+    u | array | optional (n, 8) uniform numbers that pick the value of
+                each randomized input, as in params(u=...)
+    
+    Returns a dict of arrays with one entry per scenario, which can be
+    passed to simulate_batch() or turned into a dataframe. A range whose
+    min equals its max gives that value for every scenario.
+    
+    '''
+    
+    import numpy as np
+    
+    # separate streams keep the first rows the same for any n
+    rng_u, rng_normal = [np.random.default_rng(seed) for seed in np.random.SeedSequence(random_seed).spawn(2)]
+    
+    if u is None:
+        u = rng_u.random((n, 8))
+    
+    u = np.asarray(u)
+    
+    def _choice_(i, grid):
+        grid = np.asarray(grid)
+        if len(grid) == 0:
+            return np.full(n, _fixed_[i])
+        index = np.minimum((u[:, i] * len(grid)).astype(int), len(grid) - 1)
+        return grid[index]
+    
+    # a range of zero width has an empty grid, its min is used instead
+    _fixed_ = [total_capacity_min,
+               ventilated_icu_share_min,
+               standard_cfr_min,
+               ventilated_cfr_min,
+               standard_duration_min,
+               ventilated_duration_factor_min,
+               doubles_in_days_min,
+               ventilation_rate_min]
+    
+    _random_normal_ = rng_normal.normal(loc=1, scale=0.01, size=n)
+    
+    _capacity_ = _choice_(0, range(total_capacity_min, total_capacity_max, 50))
+    _ventilated_capacity_ = _choice_(1, np.arange(ventilated_icu_share_min, ventilated_icu_share_max, step=.01))
+    _fatality_rate_ = _choice_(2, np.arange(standard_cfr_min, standard_cfr_max, step=.01))
+    _ventilated_fatality_factor_ = _choice_(3, np.arange(ventilated_cfr_min, ventilated_cfr_max, step=0.01))
+    _standard_icu_stay_duration_ = _choice_(4, np.arange(standard_duration_min, standard_duration_max, step=0.1))
+    _ventilated_duration_factor_ = _choice_(5, np.arange(ventilated_duration_factor_min, ventilated_duration_factor_max, step=0.01))
+    _doubles_in_days_ = _choice_(6, np.arange(doubles_in_days_min, doubles_in_days_max, step=.1))
+    _require_ventilation_rate_ = _choice_(7, np.arange(ventilation_rate_min, ventilation_rate_max, step=.01))
+    
+    p = {'initial_patient_count': np.full(n, int(initial_patient_count)),
+         'days_to_simulate': np.full(n, int(days_to_simulate)),
+         'doubles_in_days': _doubles_in_days_.astype(float),
+         'ventilation_rate': _require_ventilation_rate_.astype(float),
+         'standard_capacity': (_capacity_ * (1 - _ventilated_capacity_)).astype(int),
+         'ventilated_capacity': (_capacity_ * _ventilated_capacity_).astype(int),
+         'standard_cfr': _fatality_rate_.astype(float),
+         'ventilated_cfr': _fatality_rate_ * _random_normal_ * _ventilated_fatality_factor_,
+         'standard_duration': _standard_icu_stay_duration_.astype(int),
+         'ventilated_duration': (_standard_icu_stay_duration_ * _random_normal_ * _ventilated_duration_factor_).astype(int)}
+    
+    return p
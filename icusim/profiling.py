@@ -0,0 +1,97 @@
+import time
+
+import numpy as np
+
+
+class Profile:
+
+    def __init__(self):
+
+        '''Counters collected by simulate(profile=...) for the SimPy
+        engine, and summed over rounds by MonteCarlo(profile=True).
+
+        seconds | float | wall time of the simulation runs
+        phase_seconds | dict | time spent in each simulation phase
+        phase_calls | dict | number of times each phase was run
+        events | int | number of SimPy events processed
+        processes | int | number of SimPy processes created
+        peak_ward_size | dict | largest number of patients in each ward
+        arrivals_per_day | array | patients drawn to arrive on each day,
+                                   summed over rounds
+        rounds | int | number of simulation runs in the counters
+
+        '''
+
+        self.seconds = 0.0
+        self.phase_seconds = {}
+        self.phase_calls = {}
+        self.events = 0
+        self.processes = 0
+        self.peak_ward_size = {}
+        self.arrivals_per_day = np.zeros(0, dtype=int)
+        self.rounds = 0
+
+    def add(self, phase, seconds):
+
+        self.phase_seconds[phase] = self.phase_seconds.get(phase, 0.0) + seconds
+        self.phase_calls[phase] = self.phase_calls.get(phase, 0) + 1
+
+    def add_arrivals(self, day, count):
+
+        if day >= len(self.arrivals_per_day):
+            self.arrivals_per_day = np.pad(self.arrivals_per_day, (0, day + 1 - len(self.arrivals_per_day)))
+
+        self.arrivals_per_day[day] += count
+
+    def merge(self, other):
+
+        '''Adds the counters of another Profile to this one.'''
+
+        self.seconds += other.seconds
+        self.events += other.events
+        self.processes += other.processes
+        self.rounds += other.rounds
+
+        for phase in other.phase_seconds:
+            self.phase_seconds[phase] = self.phase_seconds.get(phase, 0.0) + other.phase_seconds[phase]
+            self.phase_calls[phase] = self.phase_calls.get(phase, 0) + other.phase_calls[phase]
+
+        for ward, size in other.peak_ward_size.items():
+            self.peak_ward_size[ward] = max(self.peak_ward_size.get(ward, 0), size)
+
+        for day, count in enumerate(other.arrivals_per_day):
+            self.add_arrivals(day, count)
+
+        return self
+
+    def dataframe(self):
+
+        '''Returns the time per phase as a dataframe, slowest first.'''
+
+        import pandas as pd
+
+        out = pd.DataFrame({'seconds': pd.Series(self.phase_seconds),
+                            'calls': pd.Series(self.phase_calls)})
+        out['share'] = out['seconds'] / self.seconds if self.seconds > 0 else np.nan
+
+        return out.sort_values('seconds', ascending=False)
+
+
+def profiled(generator, phase, profile):
+
+    '''Wraps a SimPy process generator so that the time spent running
+    it is added to the given phase.'''
+
+    value = None
+
+    while True:
+        start = time.perf_counter()
+
+        try:
+            event = generator.send(value)
+        except StopIteration as stop:
+            return stop.value
+        finally:
+            profile.add(phase, time.perf_counter() - start)
+
+        value = yield event
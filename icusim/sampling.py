@@ -0,0 +1,52 @@
+_SAMPLING_ = ['random', 'antithetic', 'lhs', 'sobol']
+
+# number of inputs params() picks at random
+_DIMENSIONS_ = 8
+
+
+def uniform_design(rounds, sampling, random_seed=None, dimensions=_DIMENSIONS_, skip=0):
+
+    '''Returns a (rounds, dimensions) array of uniform numbers in [0, 1)
+    to be passed row by row as params(u=...).
+
+    rounds | int | number of rows
+    sampling | str | 'antithetic' for pairs of rows u and 1 - u, 'lhs'
+                     for a Latin hypercube or 'sobol' for a scrambled
+                     Sobol sequence
+    random_seed | int | seed of the design; the same seed gives the same
+                        design for any parameter ranges, which makes runs
+                        of different plans use common random numbers
+    dimensions | int | number of columns
+    skip | int | for 'sobol', the number of points of the sequence to
+                 skip, so that a long sequence can be drawn in parts
+
+    '''
+
+    import numpy as np
+
+    if sampling not in _SAMPLING_[1:]:
+        raise ValueError("sampling must be one of " + ', '.join(_SAMPLING_[1:]))
+
+    rng = np.random.default_rng(random_seed)
+
+    if sampling == 'antithetic':
+        design = np.empty((rounds, dimensions))
+        half = rng.random((-(-rounds // 2), dimensions))
+        design[0::2] = half
+        design[1::2] = 1 - half[:rounds // 2]
+        return np.minimum(design, np.nextafter(1, 0))
+
+    if sampling == 'lhs':
+        strata = np.argsort(rng.random((rounds, dimensions)), axis=0)
+        return (strata + rng.random((rounds, dimensions))) / rounds
+
+    from scipy.stats import qmc
+    import warnings
+
+    # balance properties need a power of two, but any prefix still works
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        sequence = qmc.Sobol(dimensions, scramble=True, seed=rng)
+        if skip:
+            sequence.fast_forward(skip)
+        return sequence.random(rounds)
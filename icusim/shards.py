@@ -0,0 +1,72 @@
+def shard_range(rounds, shard):
+
+    '''Returns the (start, stop) rounds of shard (index, count), which
+    splits the rounds into count nearly equal consecutive ranges.'''
+
+    index, count = shard
+
+    if not 0 <= index < count:
+        raise ValueError("shard must be (index, count) with 0 <= index < count")
+
+    return index * rounds // count, (index + 1) * rounds // count
+
+
+def save_shard(directory, kind, shard, study, results):
+
+    '''Writes the results of one shard into directory, together with
+    the description of the study it belongs to.
+
+    directory | str | shared directory of the shards of the study
+    kind | str | the command that ran the shard
+    shard | tuple | (index, count) of the shard
+    study | dict | settings that must be equal across the shards
+    results | dict | results of the shard
+
+    '''
+
+    import os
+    from .checkpoint import save_checkpoint
+
+    os.makedirs(directory, exist_ok=True)
+
+    index, count = shard
+    path = os.path.join(directory, '%s-shard-%05d-of-%05d.pkl' % (kind, index, count))
+
+    save_checkpoint(path, {'kind': kind,
+                           'shard': tuple(shard),
+                           'study': study,
+                           'results': results})
+
+    return path
+
+
+def load_shards(path, kind):
+
+    '''Loads the shards of one study from a directory or a list of
+    files and returns their states ordered by shard index. Raises if
+    the shards belong to different studies or some are missing.'''
+
+    import os
+    from glob import glob
+    from .checkpoint import load_checkpoint
+
+    if isinstance(path, str):
+        path = sorted(glob(os.path.join(path, kind + '-shard-*.pkl')))
+
+    states = [load_checkpoint(file) for file in path]
+
+    if not states:
+        raise ValueError("No %s shards found" % kind)
+
+    for state in states:
+        if state['kind'] != kind or state['study'] != states[0]['study']:
+            raise ValueError("The shards belong to different studies")
+
+    count = states[0]['shard'][1]
+    found = {state['shard'][0] for state in states}
+    missing = sorted(set(range(count)) - found)
+
+    if missing or len(states) != count:
+        raise ValueError("Shards %s of %d are missing or duplicated" % (missing, count))
+
+    return sorted(states, key=lambda state: state['shard'][0])
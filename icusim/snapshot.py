@@ -0,0 +1,121 @@
+import random
+
+import numpy as np
+
+
+class Snapshot:
+
+    def __init__(self, p, day, wards, counters, statistic, numpy_state, random_state):
+
+        '''State of a SimPy simulation at the end of a day, from which
+        branch() continues. Holds only plain data, so it can be pickled
+        or written with save().
+
+        p | dict | input parameters of the simulated prefix
+        day | int | number of days simulated
+        wards | dict | (stay end time, patient dies) arrays of the
+                       patients in each ward
+        counters | dict | refused, accepted, released and died counts of
+                          each ward not yet recorded in the statistic
+        statistic | array | (day, metric) results of the days simulated
+        numpy_state | tuple | state of numpy.random
+        random_state | tuple | state of the random module
+
+        '''
+
+        self.p = p
+        self.day = day
+        self.wards = wards
+        self.counters = counters
+        self.statistic = statistic
+        self.numpy_state = numpy_state
+        self.random_state = random_state
+
+    def save(self, path):
+
+        from .checkpoint import save_checkpoint
+
+        save_checkpoint(path, self)
+
+    @staticmethod
+    def load(path):
+
+        from .checkpoint import load_checkpoint
+
+        return load_checkpoint(path)
+
+
+def snapshot(p, day, random_seed=None):
+
+    '''Simulates the first days of p with the SimPy engine and returns
+    the state at the end of day as a Snapshot.
+
+    p | dict | input parameters, for example from icusim.params()
+    day | int | number of days to simulate before the snapshot
+    random_seed | int | seed for reproducible results
+
+    '''
+
+    from .icu_burden_simulator import _start_simpy
+
+    if not 1 <= day <= p['days_to_simulate']:
+        raise ValueError("day must be between 1 and days_to_simulate")
+
+    env, hospital = _start_simpy(p, random_seed)
+    env.run(until=day * 24)
+
+    wards = {icu_type: (ward.stay_duration.copy(), ward.patient_die.copy())
+             for icu_type, ward in hospital.departments_capacity.items()}
+
+    counters = {'refused': dict(hospital.daily_refused_total),
+                'accepted': dict(hospital.daily_accepted_total),
+                'released': dict(hospital.daily_released_total),
+                'died': dict(hospital.daily_died_total)}
+
+    return Snapshot(dict(p),
+                    day,
+                    wards,
+                    counters,
+                    hospital.statistic[:day].copy(),
+                    np.random.get_state(),
+                    random.getstate())
+
+
+def branch(state, changes=None, random_seed=None, output='dict'):
+
+    '''Continues a simulation from a Snapshot with optionally changed
+    inputs, such as more capacity, and returns the daily statistics of
+    all days like simulate(). Without changes and random_seed, the
+    result equals an uninterrupted simulate() run with the same seed.
+
+    state | Snapshot | state from snapshot()
+    changes | dict | inputs of p that change from the snapshot day on;
+                     days_to_simulate can also extend the horizon
+    random_seed | int | if set, the days after the snapshot use a new
+                        random stream, so that different seeds give
+                        different futures; by default every branch
+                        continues with the random numbers of the prefix
+    output | str | 'dict' or 'array', see simulate()
+
+    '''
+
+    from .icu_burden_simulator import _start_simpy
+    from .numpy_simulator import statistic_to_dict
+
+    if output not in ('dict', 'array'):
+        raise ValueError("output must be 'dict' or 'array'")
+
+    p = dict(state.p, **(changes or {}))
+
+    if p['days_to_simulate'] < state.day:
+        raise ValueError("days_to_simulate must be at least the snapshot day")
+
+    env, hospital = _start_simpy(p, random_seed, snapshot=state)
+
+    if p['days_to_simulate'] > state.day:
+        env.run(until=p['days_to_simulate'] * 24)
+
+    if output == 'array':
+        return hospital.statistic
+
+    return statistic_to_dict(hospital.statistic)
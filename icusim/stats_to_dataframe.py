@@ -1,28 +1,36 @@
 def stats_to_dataframe(results):
 
-    import pandas as pd
+    '''Turns the output of simulate() into a dataframe with one row per
+    day and the columns of icusim.columns().
+
+    results | dict, array or list | the {day: {metric: {icu_type: value}}}
+                                    output of simulate(), a (day, metric)
+                                    array from simulate(output='array'),
+                                    or many such arrays stacked as (round,
+                                    day, metric) or in a list
 
-    out = []
-    cols = []
+    For many rounds, the frame is in long format with a round and a day
+    column and one row per round and day.
 
-    # get day key
-    for day in results.keys():
+    '''
 
-        _temp_ = []
-        cols = []
+    import numpy as np
+    import pandas as pd
+    from .utils import columns
 
-        # get metric name key
-        for metric in results[day].keys():
+    if isinstance(results, dict):
+        from .numpy_simulator import statistic_to_array
+        results = statistic_to_array(results)
 
-            _temp_.append(results[day][metric]['standard_icu'])
-            _temp_.append(results[day][metric]['ventilated_icu'])
+    results = np.asarray(results)
 
-            cols.append('standard_icu_' + metric)
-            cols.append('ventilated_icu_' + metric)
+    if results.ndim == 2:
+        return pd.DataFrame(results, columns=columns())
 
-        out.append(_temp_)
+    rounds, days, _ = results.shape
 
-    df = pd.DataFrame(out)
-    df.columns = cols
+    df = pd.DataFrame(results.reshape(rounds * days, -1), columns=columns())
+    df.insert(0, 'day', np.tile(np.arange(1, days + 1), rounds))
+    df.insert(0, 'round', np.repeat(np.arange(rounds), days))
 
     return df
@@ -0,0 +1,250 @@
+import numpy as np
+
+
+class _Accumulator:
+
+    '''Running count, mean and variance, a log-bucketed quantile sketch
+    and exceedance counts for an array of values with a fixed shape.
+    Missing (NaN) values are skipped element by element.'''
+
+    def __init__(self, shape, thresholds, gamma, buckets):
+
+        self.thresholds = thresholds
+        self.gamma = gamma
+        self.buckets = buckets
+
+        self.count = np.zeros(shape, dtype=np.int64)
+        self.mean = np.zeros(shape)
+        self.m2 = np.zeros(shape)
+        self.sketch = np.zeros(shape + (buckets,), dtype=np.int64)
+        self.exceeded = np.zeros((len(thresholds),) + shape, dtype=np.int64)
+
+    def _bucket(self, values):
+
+        # bucket 0 holds zeros, bucket i holds (gamma^(i-2), gamma^(i-1)]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            index = np.ceil(np.log(values) / np.log(self.gamma))
+
+        index = np.clip(np.nan_to_num(index, nan=0, neginf=0), 0, self.buckets - 2) + 1
+
+        return np.where(values > 0, index, 0).astype(np.int64)
+
+    def update(self, values):
+
+        values = np.asarray(values, dtype=float)
+        observed = ~np.isnan(values)
+        values = np.where(observed, values, 0)
+
+        # Welford's update for mean and variance
+        self.count += observed
+        delta = np.where(observed, values - self.mean, 0)
+        self.mean += np.divide(delta, self.count, out=np.zeros_like(delta), where=self.count > 0)
+        self.m2 += delta * np.where(observed, values - self.mean, 0)
+
+        position = np.arange(values.size).reshape(values.shape) * self.buckets + self._bucket(values)
+        self.sketch += np.bincount(position[observed], minlength=self.sketch.size).reshape(self.sketch.shape)
+
+        for i, threshold in enumerate(self.thresholds):
+            self.exceeded[i] += observed & (values > threshold)
+
+    def merge(self, other):
+
+        # Chan et al. parallel combination of mean and variance
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        weight = np.divide(other.count, count, out=np.zeros(count.shape), where=count > 0)
+
+        self.mean = self.mean + delta * weight
+        self.m2 = self.m2 + other.m2 + delta ** 2 * self.count * weight
+        self.count = count
+        self.sketch += other.sketch
+        self.exceeded += other.exceeded
+
+    def variance(self):
+
+        return np.divide(self.m2, self.count - 1, out=np.full(self.m2.shape, np.nan), where=self.count > 1)
+
+    def quantile(self, q):
+
+        cumulative = np.cumsum(self.sketch, axis=-1)
+        rank = q * (self.count - 1)
+        index = np.argmax(cumulative > rank[..., None], axis=-1)
+
+        # midpoint of the bucket in relative terms
+        value = 2 * self.gamma ** (index - 1) / (self.gamma + 1)
+        value = np.where(index == 0, 0, value)
+
+        return np.where(self.count > 0, value, np.nan)
+
+    def exceedance(self):
+
+        return np.divide(self.exceeded, self.count, out=np.full(self.exceeded.shape, np.nan), where=self.count > 0)
+
+
+class Summary:
+
+    def __init__(self,
+                 thresholds=None,
+                 relative_accuracy=0.01,
+                 max_value=1e9,
+                 keep_daily=True):
+
+        '''Streaming summary of simulation rounds that needs memory
+        proportional to the number of days, not the number of rounds.
+        Keeps per-day and peak mean, variance, approximate quantiles
+        and exceedance counts. Summaries of separate workers can be
+        combined with merge().
+
+        thresholds | list | values for which the share of rounds above
+                            the threshold is counted
+        relative_accuracy | float | relative error of the quantiles
+        max_value | float | largest value resolved by the quantiles
+        keep_daily | bool | if False, only the peak statistics are kept,
+                            which leaves out the per-day quantile sketch
+                            of about (day, metric, 1000) counts
+
+        '''
+
+        self.thresholds = list(thresholds or [])
+        self.relative_accuracy = relative_accuracy
+        self.max_value = max_value
+        self.keep_daily = keep_daily
+
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.buckets = int(np.ceil(np.log(max_value) / np.log(self.gamma))) + 2
+
+        self.rounds = 0
+        self.daily = None
+        self.peak = None
+
+    def _init(self, days, metrics):
+
+        if self.keep_daily:
+            self.daily = _Accumulator((days, metrics), self.thresholds, self.gamma, self.buckets)
+
+        self.peak = _Accumulator((metrics,), self.thresholds, self.gamma, self.buckets)
+
+    def update(self, daily):
+
+        '''Adds the (day, metric) results of one round.'''
+
+        daily = np.asarray(daily, dtype=float)
+
+        if self.peak is None:
+            self._init(*daily.shape)
+
+        if self.daily is not None:
+            self.daily.update(daily)
+
+        self.peak.update(np.nanmax(daily, axis=0))
+        self.rounds += 1
+
+        return self
+
+    def merge(self, other):
+
+        '''Combines another Summary into this one.'''
+
+        if other.peak is None:
+            return self
+
+        if self.keep_daily and other.daily is None:
+            raise ValueError("A Summary without daily statistics cannot be merged into one with them")
+
+        if self.peak is None:
+            self._init(other.daily.count.shape[0] if self.keep_daily else None, other.peak.count.shape[0])
+
+        if self.daily is not None:
+            self.daily.merge(other.daily)
+
+        self.peak.merge(other.peak)
+        self.rounds += other.rounds
+
+        return self
+
+    def dataframe(self, peak=False, quantiles=(.05, .5, .95)):
+
+        '''Returns the summary as a tidy dataframe with one row per day
+        and metric, or per metric when peak is True.'''
+
+        import pandas as pd
+        from .utils import columns
+
+        if not peak and not self.keep_daily:
+            raise ValueError("This Summary only keeps peak statistics, use peak=True")
+
+        accumulator = self.peak if peak else self.daily
+        metrics = list(columns())
+
+        out = {}
+
+        if peak:
+            out['metric'] = metrics
+        else:
+            days, _ = accumulator.count.shape
+            out['day'] = np.repeat(np.arange(1, days + 1), len(metrics))
+            out['metric'] = metrics * days
+
+        out['rounds'] = accumulator.count.ravel()
+        out['mean'] = accumulator.mean.ravel()
+        out['std'] = np.sqrt(accumulator.variance()).ravel()
+
+        for q in quantiles:
+            out['q' + str(q)] = accumulator.quantile(q).ravel()
+
+        exceedance = accumulator.exceedance()
+
+        for i, threshold in enumerate(self.thresholds):
+            out['p>' + str(threshold)] = exceedance[i].ravel()
+
+        return pd.DataFrame(out)
+
+
+def confidence_interval(values,
+                        statistic='mean',
+                        confidence=.95,
+                        quantile=.5,
+                        threshold=None):
+
+    '''Returns the estimate and confidence interval (estimate, low, high)
+    of a statistic of the given values.
+
+    values | array | one value per round
+    statistic | str | 'mean', 'quantile' or 'exceedance'
+    confidence | float | confidence level of the interval
+    quantile | float | the quantile when statistic is 'quantile'
+    threshold | float | the threshold when statistic is 'exceedance'
+
+    '''
+
+    from scipy.stats import norm
+
+    values = np.asarray(values, dtype=float)
+    values = values[~np.isnan(values)]
+    n = len(values)
+    z = norm.ppf(0.5 + confidence / 2)
+
+    if n < 2:
+        return np.nan, -np.inf, np.inf
+
+    if statistic == 'mean':
+        estimate = values.mean()
+        half_width = z * values.std(ddof=1) / np.sqrt(n)
+        return estimate, estimate - half_width, estimate + half_width
+
+    if statistic == 'exceedance':
+        # Wilson score interval for a proportion
+        estimate = np.mean(values > threshold)
+        center = (estimate + z ** 2 / (2 * n)) / (1 + z ** 2 / n)
+        half_width = z * np.sqrt(estimate * (1 - estimate) / n + z ** 2 / (4 * n ** 2)) / (1 + z ** 2 / n)
+        return estimate, center - half_width, center + half_width
+
+    if statistic == 'quantile':
+        # distribution-free interval from order statistics
+        values = np.sort(values)
+        spread = z * np.sqrt(n * quantile * (1 - quantile))
+        low = int(np.clip(np.floor(n * quantile - spread), 0, n - 1))
+        high = int(np.clip(np.ceil(n * quantile + spread), 0, n - 1))
+        return np.quantile(values, quantile), values[low], values[high]
+
+    raise ValueError("statistic must be 'mean', 'quantile' or 'exceedance'")
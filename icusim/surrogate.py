@@ -0,0 +1,139 @@
+import numpy as np
+
+
+class PolynomialChaos:
+
+    def __init__(self, degree=2):
+
+        '''Polynomial chaos expansion of a model with inputs uniform on
+        [-1, 1], fitted by least squares on orthonormal Legendre
+        polynomials. Sobol indices follow directly from the squared
+        coefficients.
+
+        degree | int | highest total degree of the polynomials
+
+        '''
+
+        self.degree = degree
+
+    def _terms(self, dimensions):
+
+        from itertools import combinations_with_replacement
+
+        terms = [np.zeros(dimensions, dtype=int)]
+
+        for degree in range(1, self.degree + 1):
+            for variables in combinations_with_replacement(range(dimensions), degree):
+                terms.append(np.bincount(variables, minlength=dimensions))
+
+        return np.array(terms)
+
+    def _design(self, x):
+
+        from numpy.polynomial.legendre import legval
+
+        # orthonormal Legendre polynomials of each degree for each input
+        basis = np.stack([legval(x, np.eye(self.degree + 1)[n]) * np.sqrt(2 * n + 1)
+                          for n in range(self.degree + 1)])
+
+        columns = np.arange(x.shape[1])
+
+        return np.stack([basis[term, :, columns].prod(axis=0) for term in self.terms], axis=1)
+
+    def fit(self, x, y):
+
+        '''Fits the expansion to inputs x with shape (sample, input)
+        scaled to [-1, 1] and outputs y with shape (sample,), or
+        (sample, output) to fit many outputs in one solve.'''
+
+        self.terms = self._terms(x.shape[1])
+
+        if len(x) <= len(self.terms):
+            raise ValueError("A degree %d expansion of %d inputs needs more than %d samples"
+                             % (self.degree, x.shape[1], len(self.terms)))
+
+        self._x = x
+        self._y = np.asarray(y, dtype=float)
+        self._psi = self._design(x)
+        self.coefficients = np.linalg.lstsq(self._psi, self._y, rcond=None)[0]
+
+        return self
+
+    def predict(self, x):
+
+        return self._design(x) @ self.coefficients
+
+    def indices(self, coefficients=None):
+
+        '''Returns first-order and total Sobol indices per input, with
+        shape (input,) or (input, output).'''
+
+        if coefficients is None:
+            coefficients = self.coefficients
+
+        share = coefficients[1:] ** 2
+        active = self.terms[1:] > 0
+        variance = share.sum(axis=0)
+
+        only = active & (active.sum(axis=1, keepdims=True) == 1)
+
+        def _share_(mask):
+            explained = mask.T.astype(float) @ share
+            return np.divide(explained, variance, out=np.zeros_like(explained), where=variance > 0)
+
+        return _share_(only), _share_(active)
+
+    def second_order_indices(self):
+
+        '''Returns the matrix of second-order Sobol indices, with the
+        diagonal and lower triangle left as NaN.'''
+
+        share = self.coefficients[1:] ** 2
+        active = self.terms[1:] > 0
+        pairs = active & (active.sum(axis=1, keepdims=True) == 2)
+
+        variance = share.sum()
+        out = np.full((active.shape[1], active.shape[1]), np.nan)
+
+        for i, j in zip(*np.triu_indices(active.shape[1], 1)):
+            out[i, j] = share[pairs[:, i] & pairs[:, j]].sum() / variance if variance > 0 else 0
+
+        return out
+
+    def validation_score(self):
+
+        '''Returns the leave-one-out Q2 of the fit, computed in closed
+        form from the leverages; 1 is a perfect prediction.'''
+
+        q, _ = np.linalg.qr(self._psi)
+        leverage = np.minimum((q ** 2).sum(axis=1), 1 - 1e-12)
+        residual = self._y - self._psi @ self.coefficients
+
+        if residual.ndim == 2:
+            leverage = leverage[:, None]
+
+        press = np.sum((residual / (1 - leverage)) ** 2, axis=0)
+        total = np.sum((self._y - self._y.mean(axis=0)) ** 2, axis=0)
+
+        return 1 - np.divide(press, total, out=np.full(np.shape(total), np.nan), where=total > 0)
+
+    def bootstrap(self, resamples=100, confidence=.95, random_seed=None):
+
+        '''Returns the half widths of the confidence intervals of the
+        first-order and total indices, from refits on resampled rows.'''
+
+        from scipy.stats import norm
+
+        rng = np.random.default_rng(random_seed)
+        first, total = [], []
+
+        for i in range(resamples):
+            rows = rng.integers(0, len(self._y), len(self._y))
+            coefficients = np.linalg.lstsq(self._psi[rows], self._y[rows], rcond=None)[0]
+            s1, st = self.indices(coefficients)
+            first.append(s1)
+            total.append(st)
+
+        z = norm.ppf(0.5 + confidence / 2)
+
+        return z * np.std(first, axis=0, ddof=1), z * np.std(total, axis=0, ddof=1)
@@ -0,0 +1,56 @@
+def open_trajectories(path, rounds, days, metrics):
+
+    '''Creates a preallocated on-disk array with shape (round, day,
+    metric) for streaming daily results into. Days that are never
+    written stay NaN.'''
+
+    import numpy as np
+
+    trajectories = np.lib.format.open_memmap(path,
+                                             mode='w+',
+                                             dtype=np.float32,
+                                             shape=(rounds, days, metrics))
+    trajectories[:] = np.nan
+
+    return trajectories
+
+
+def resize_trajectories(path, rounds):
+
+    '''Grows an on-disk trajectory array to hold the given number of
+    rounds, keeping the rounds already written.'''
+
+    import os
+
+    existing = load_trajectories(path)
+
+    if existing.shape[0] >= rounds:
+        return load_trajectories(path, mode='r+')
+
+    temp_path = path + '.tmp.npy'
+    trajectories = open_trajectories(temp_path, rounds, *existing.shape[1:])
+    trajectories[:existing.shape[0]] = existing
+    trajectories.flush()
+
+    del existing, trajectories
+    os.replace(temp_path, path)
+
+    return load_trajectories(path, mode='r+')
+
+
+def load_trajectories(path, mode='r'):
+
+    '''Opens daily results saved with MonteCarlo(trajectory_path=...)
+    memory-mapped, so slicing reads only the requested part from disk.
+
+    path | str | path to the .npy file
+    mode | str | 'r' for read-only or 'r+' for writing into the file
+
+    Returns an array with shape (round, day, metric) where the metrics
+    follow icusim.columns() and day 0 is the first simulated day.
+
+    '''
+
+    import numpy as np
+
+    return np.load(path, mmap_mode=mode)
@@ -15,10 +15,16 @@ def _dump_dictionary_(obj):
     else:
         print(obj)
 
+# the fixed output schema of simulate(): for each metric both ICU types
+_METRICS_ = ['total_demand', 'total_released', 'total_refused', 'total_died']
+
+_ICU_TYPES_ = ['standard_icu', 'ventilated_icu']
+
+
 def columns():
 
     '''Helper for returning the column names'''
 
-    import icusim
+    import pandas as pd
 
-    return icusim.stats_to_dataframe(icusim.simulate()).columns
+    return pd.Index([icu_type + '_' + metric for metric in _METRICS_ for icu_type in _ICU_TYPES_])
@@ -24,7 +24,11 @@ install_requires = ['simpy==3.0.12',
                     'numpy',
                     'pandas',
                     'tqdm',
-                    'salib']
+                    'salib',
+                    'scipy']
+
+# writing .parquet from the command line needs a parquet engine
+extras_require = {'parquet': ['pyarrow']}
 
 if __name__ == "__main__":
 
@@ -40,7 +44,9 @@ if __name__ == "__main__":
           version=VERSION,
           download_url=DOWNLOAD_URL,
           install_requires=install_requires,
+          extras_require=extras_require,
           packages=['icusim', 'icusim.commands'],
+          entry_points={'console_scripts': ['icusim=icusim.cli:main']},
 
           classifiers=['Intended Audience :: Science/Research',
                        'Programming Language :: Python :: 3.5',
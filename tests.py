@@ -1,8 +1,40 @@
+import os
+import tempfile
+
 import icusim
 
 out = icusim.simulate(icusim.params())
 df = icusim.stats_to_dataframe(out)
 
+out = icusim.simulate(icusim.params(initial_patient_count=20), random_seed=1, output='array')
+df = icusim.stats_to_dataframe([out, out])
+
+out, profile = icusim.simulate(icusim.params(initial_patient_count=20), random_seed=1, profile=True)
+profile.dataframe()
+
+for engine in ['simpy', 'numpy', 'cohort']:
+    for daily in icusim.simulate_iter(icusim.params(initial_patient_count=20), random_seed=1, engine=engine):
+        pass
+out = icusim.simulate(icusim.params(initial_patient_count=20), random_seed=1, output='array',
+                      stop_when=icusim.exceeds('standard_icu_total_demand', 100, cumulative=True))
+df = icusim.stats_to_dataframe(icusim.simulate(icusim.params(initial_patient_count=20), random_seed=1,
+                                               stop_when=lambda daily: len(daily) == 3))
+
+p = icusim.params(initial_patient_count=20)
+state = icusim.snapshot(p, 5, random_seed=1)
+assert (icusim.branch(state, output='array') == icusim.simulate(p, random_seed=1, output='array')).all()
+out = icusim.branch(state, {'ventilated_capacity': 500}, output='array')
+df = icusim.stats_to_dataframe(icusim.branch(state, random_seed=2))
+
+out = icusim.simulate(icusim.params(initial_patient_count=20), random_seed=1, engine='numpy')
+df = icusim.stats_to_dataframe(out)
+
+out = icusim.simulate(icusim.params(initial_patient_count=20), random_seed=1, engine='cohort')
+df = icusim.stats_to_dataframe(out)
+
+out = icusim.simulate_batch([icusim.params(initial_patient_count=20) for i in range(5)], random_seed=1)
+out = icusim.simulate_batch(icusim.params_batch(5, initial_patient_count=20, random_seed=1), random_seed=1)
+
 params = {'initial_patient_count': 80,
           'days_to_simulate': 50,
           'total_capacity_min': 200,
@@ -23,5 +55,83 @@ params = {'initial_patient_count': 80,
           'ventilation_rate_max': 0.8}
 
 results = icusim.MonteCarlo(10, params)
+results = icusim.MonteCarlo(10, params, n_jobs=2, random_seed=1, engine='numpy')
+assert results.df.equals(icusim.MonteCarlo(10, params, random_seed=1, engine='numpy').df)
+results = icusim.MonteCarlo(4, params, n_jobs=2, random_seed=1, profile=True)
+results = icusim.MonteCarlo(4, params, n_jobs=2, random_seed=1, engine='numpy',
+                            trajectory_path=os.path.join(tempfile.mkdtemp(), 'stopped.npy'),
+                            stop_when=icusim.exceeds('ventilated_icu_total_refused', 0))
+results = icusim.MonteCarlo(4, params, random_seed=1, engine='numpy',
+                            stop_when=icusim.exceeds('ventilated_icu_total_refused', 10 ** 9))
+assert results.df.equals(icusim.MonteCarlo(4, params, random_seed=1, engine='numpy').df)
+
+trajectory_path = os.path.join(tempfile.mkdtemp(), 'trajectories.npy')
+results = icusim.MonteCarlo(10, params, engine='numpy', trajectory_path=trajectory_path)
+trajectories = icusim.load_trajectories(trajectory_path)
+
+results = icusim.MonteCarlo(10, params, engine='numpy', thresholds=[278], keep_results=False)
+summary = results.summary.dataframe(peak=True)
+
+cache_path = tempfile.mkdtemp()
+results = icusim.MonteCarlo(10, params, random_seed=1, engine='numpy', cache=cache_path)
+results = icusim.MonteCarlo(10, params, random_seed=1, engine='numpy', cache=cache_path)
+
+checkpoint_path = os.path.join(tempfile.mkdtemp(), 'checkpoint.pkl')
+results = icusim.MonteCarlo(5, params, engine='numpy', checkpoint_path=checkpoint_path, checkpoint_every=2)
+results = icusim.MonteCarlo(10, params, engine='numpy', resume=checkpoint_path)
+
+checkpoint_path = os.path.join(tempfile.mkdtemp(), 'checkpoint.pkl')
+results = icusim.MonteCarlo(4, params, random_seed=1, engine='numpy', checkpoint_path=checkpoint_path, checkpoint_every=2)
+resumed = icusim.MonteCarlo(12, params, random_seed=1, engine='numpy', resume=checkpoint_path)
+assert resumed.df.equals(icusim.MonteCarlo(12, params, random_seed=1, engine='numpy').df)
+
+results = icusim.MonteCarlo(100, params, engine='numpy', batch_size=20,
+                            target_metric='standard_icu_total_demand', target_width=100)
+for sampling in ['antithetic', 'lhs', 'sobol']:
+    results = icusim.MonteCarlo(10, params, random_seed=1, engine='numpy', sampling=sampling)
+for sampling in ['antithetic', 'sobol']:
+    results = icusim.MonteCarlo(4, params, random_seed=1, engine='numpy', sampling=sampling, checkpoint_path=checkpoint_path)
+    resumed = icusim.MonteCarlo(10, params, random_seed=1, engine='numpy', sampling=sampling, resume=checkpoint_path)
+    assert resumed.df.equals(icusim.MonteCarlo(10, params, random_seed=1, engine='numpy', sampling=sampling).df)
+
+shard_path = tempfile.mkdtemp()
+for i in range(2):
+    icusim.MonteCarlo(10, params, random_seed=1, engine='numpy', shard=(i, 2), shard_path=shard_path)
+    icusim.SobolSensitivity(40, params, random_seed=1, shard=(i, 2), shard_path=shard_path)
+results = icusim.MonteCarlo.merge(shard_path)
+assert results.df.equals(icusim.MonteCarlo(10, params, random_seed=1, engine='numpy').df)
+results = icusim.SobolSensitivity.merge(shard_path)
+assert results.results.equals(icusim.SobolSensitivity(40, params, random_seed=1).results)
+results.sensitivity()
+
 results = icusim.SobolSensitivity(40, params)
 results.sensitivity()
+results.extend(20)
+
+results = icusim.SobolSensitivity(36, params, random_seed=1, second_order=True, keep_daily=True)
+results.sensitivity(second_order=True)
+results.sensitivity_table()
+results.sensitivity_table(daily=True)
+
+results = icusim.SobolSensitivity(40, params, random_seed=1, surrogate=True, surrogate_degree=1)
+results.sensitivity()
+
+results = icusim.MorrisScreening(36, params, n_jobs=2, random_seed=1, engine='numpy')
+results.screening()
+results.sobol(20, metric='standard_icu_total_demand', keep=2)
+
+results = icusim.GridSweep({'total_capacity': [200, 600, 600], 'doubles_in_days': [4, 8]},
+                           params, 5, n_jobs=2, random_seed=1, engine='numpy', thresholds=[100])
+results.cube('ventilated_icu_total_demand', 'p>100')
+
+import json
+from icusim import cli
+
+job_path = os.path.join(tempfile.mkdtemp(), 'job.json')
+with open(job_path, 'w') as f:
+    json.dump({'params': params, 'rounds': 10, 'random_seed': 1, 'engine': 'numpy',
+               'gridsweep': {'axes': {'doubles_in_days': [4, 8]}}}, f)
+
+cli.main(['simulate', job_path, '--output', job_path + '.npz'])
+cli.main(['montecarlo', job_path, '--output', job_path + '.csv'])
+cli.main(['gridsweep', job_path, '--output', job_path + '.npz'])